@@ -13,4 +13,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'TRPG_Hero.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# 앱 로딩(get_asgi_application) 이후에 import
+from game.db_pool import open_connection_pools  # noqa: E402
+from game.realtime import websocket_application  # noqa: E402
+
+# 워커 시작 시 DB 연결 풀을 미리 채움
+open_connection_pools()
+
+
+async def application(scope, receive, send):
+    # WebSocket(ws/game/<id>/)은 게임 이벤트 채널로, 나머지는 Django로 전달
+    if scope['type'] == 'websocket':
+        return await websocket_application(scope, receive, send)
+    return await django_application(scope, receive, send)
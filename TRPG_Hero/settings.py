@@ -50,6 +50,8 @@ SESSION_COOKIE_SAMESITE = 'None'
 SESSION_COOKIE_SECURE = True
 CSRF_COOKIE_HTTPONLY = False
 CSRF_USE_SESSIONS = False
+# 세션을 캐시에서 먼저 읽어 폴링 요청(api_get_game_state)이 세션 테이블을 조회하지 않도록 함
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 CSRF_COOKIE_SECURE = False
 
 # 기존 MIDDLEWARE 리스트에서 순서 변경
@@ -98,6 +100,7 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # 반드시 CSRF 미들웨어 위에 추가
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'game.db_router.database_routing_middleware',  # 세션의 user id로 샤드/읽기 DB 결정 (SessionMiddleware 뒤)
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -138,9 +141,147 @@ DATABASES = {
         'PASSWORD': '1234',
         'HOST': 'localhost',
         'PORT': '5432',
+        # 요청마다 새로 연결하지 않도록 psycopg 연결 풀 사용 (Django 5.1+, psycopg[pool]).
+        # 풀은 워커 프로세스마다 하나이며 sync 뷰와 async 뷰(sync_to_async 스레드)가 함께 씀. 지표는 api/db-pool-metrics/
+        'CONN_MAX_AGE': 0,  # 연결 재사용은 풀이 담당 (풀과 persistent 연결은 함께 쓸 수 없음)
+        'CONN_HEALTH_CHECKS': True,  # 풀에서 연결을 꺼낼 때마다 상태 확인 후 끊긴 연결은 교체
+        'OPTIONS': {
+            'pool': {
+                'min_size': 2,  # 워커 시작 시 미리 열어 두는 연결 수
+                'max_size': 10,  # 워커당 최대 연결 수 (워커 수 x max_size가 Postgres max_connections 이내여야 함)
+                'timeout': 10,  # 빈 연결을 기다리는 최대 시간(초). 넘으면 PoolTimeout
+                'max_idle': 5 * 60,  # 이 시간 동안 쓰이지 않은 연결은 min_size까지 줄임
+                'max_lifetime': 60 * 60,  # 오래된 연결은 주기적으로 새 연결로 교체
+            },
+        },
     }
 }
 
+# 읽기 복제본 / 샤드 라우팅 (game/db_router.py). 기본값은 DB 하나만 사용
+# 예) 복제본: DATABASES에 'replica'를 추가하고 'REPLICAS': {'default': ['replica']}
+#     샤드: DATABASES에 'shard0', 'shard1'을 추가하고 'SHARDS': ['shard0', 'shard1'],
+#           각 샤드에 python manage.py migrate --database=shard0 실행
+# 추가하는 DB에도 default와 같은 CONN_MAX_AGE/CONN_HEALTH_CHECKS/OPTIONS['pool']을 설정
+DATABASE_ROUTERS = ['game.db_router.GameDatabaseRouter']
+GAME_DATABASE_ROUTING = {
+    'PRIMARY': 'default',
+    'REPLICAS': {},
+    'SHARDS': [],
+    'STICKY_SECONDS': 5,  # 턴을 커밋한 사용자의 읽기를 이 시간 동안 primary로 보냄
+    # 고정 표시를 저장하는 캐시. 복제본을 쓰면서 워커가 여럿이면 Redis/Memcached 등 공유 캐시로 지정
+    # (locmem은 프로세스마다 따로라 다른 워커로 간 읽기가 복제본으로 감. manage.py check가 경고함)
+    'STICKY_CACHE_ALIAS': 'default',
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # api_get_game_state 스냅샷 (턴 커밋 시 갱신). 여러 프로세스로 운영하면 Redis/Memcached 등 공유 캐시로 변경
+    'game_state_snapshots': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'game-state-snapshots',
+        'TIMEOUT': 10 * 60,
+    },
+    # 완료된 게임의 결과 페이지 (보관/삭제 시에만 무효화)
+    'game_results': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'game-results',
+        'TIMEOUT': 24 * 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+        },
+    },
+    # 마왕 응답 캐시 (단일 노드용 LRU + TTL)
+    # 파일 기반으로 쓰려면 BACKEND를 'django.core.cache.backends.filebased.FileBasedCache',
+    # LOCATION을 BASE_DIR / 'cache' / 'demon_lord_responses' 로 변경
+    'demon_lord_responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'demon-lord-responses',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,  # 초과 시 가장 오래 사용되지 않은 항목부터 제거
+            'CULL_FREQUENCY': 4,
+        },
+    },
+}
+
+DEMON_LORD_RESPONSE_CACHE = {
+    'ENABLED': True,
+    'ALIAS': 'demon_lord_responses',
+    'TIMEOUT': 60 * 60,
+    'VARIETY': 1,  # 키마다 저장할 후보 응답 수 (2 이상이면 후보 중 무작위로 응답)
+}
+
+# LLM(OpenAI) 호출 설정: 연결 풀, 프로세스당 동시 실행 수, 대기열, 재시도
+LLM_TRANSPORT = {
+    'MAX_CONCURRENCY': 32,  # 프로세스당 동시에 보낼 수 있는 LLM 요청 수
+    'MAX_QUEUE': 200,  # 슬롯을 기다릴 수 있는 요청 수 (초과 시 즉시 거절)
+    'QUEUE_TIMEOUT': 5.0,  # 대기열에서 기다리는 최대 시간(초)
+    'MAX_RETRIES': 3,  # 레이트 리밋/연결 오류 시 재시도 횟수
+    'BACKOFF_BASE': 0.5,
+    'BACKOFF_MAX': 8.0,
+    'CONNECT_TIMEOUT': 5.0,
+    'READ_TIMEOUT': 30.0,
+    'MAX_CONNECTIONS': 64,
+    'MAX_KEEPALIVE_CONNECTIONS': 32,
+    'KEEPALIVE_EXPIRY': 30.0,
+    'TURN_DEADLINE': 12.0,  # 턴당 LLM 지연 예산(초), 초과 시 태도에 맞는 기본 응답 사용
+    'HEDGE_AFTER': 4.0,  # 첫 요청이 이 시간(초) 안에 끝나지 않으면 같은 요청을 하나 더 보냄 (None이면 사용 안 함)
+    'BREAKER_FAILURE_THRESHOLD': 5,  # 연속 실패가 이 횟수에 이르면 회로 차단
+    'BREAKER_RECOVERY_TIMEOUT': 30.0,  # 차단 후 탐색 요청을 허용하기까지의 시간(초)
+    'BREAKER_HALF_OPEN_MAX_CALLS': 1,
+}
+
+# 대화 점수 사전 (키워드/감정 패턴/스토리 분기 키워드). 파일이 바뀌면 재시작 없이 교체됨
+GAME_LEXICON_PATH = BASE_DIR / 'game' / 'data' / 'lexicon.json'
+GAME_LEXICON_RELOAD_INTERVAL = 5.0  # 파일 변경 확인 주기(초)
+
+# 플레이어 메시지 감정/설득력 분석 방식: 'llm' (마왕 응답과 함께 JSON으로 받음) 또는
+# 'local' (transformers CPU 모델로 배치 분석하고 LLM에는 응답만 요청)
+PLAYER_ANALYSIS_BACKEND = 'llm'
+
+LOCAL_CLASSIFIER = {
+    'MODEL': 'nlptown/bert-base-multilingual-uncased-sentiment',
+    'MAX_BATCH_SIZE': 32,  # 한 번의 forward pass에 묶을 최대 메시지 수
+    'MAX_WAIT_MS': 10,  # 배치를 모으기 위해 기다리는 최대 시간(ms)
+    'WORKERS': 1,
+}
+
+# 프롬프트에 포함할 최근 대화 턴 수 (GameState.recent_messages에 저장)
+CONVERSATION_MEMORY_TURNS = 5
+
+# 최근 대화에서 밀려난 턴을 백그라운드에서 누적 요약(GameState.conversation_summary)으로 압축
+CONVERSATION_SUMMARY_ENABLED = True
+
+# 게임 세션 제한 시간(초). 지난 세션은 다음 메시지나 expire_sessions 명령으로 종료
+GAME_SESSION_TIME_LIMIT = 3600
+
+# 완료 후 이 기간(일)이 지난 세션의 대화 기록은 archive_transcripts 명령이 GameResult에 압축 보관
+TRANSCRIPT_ARCHIVE_AFTER_DAYS = 30
+# 결과 페이지/transcript API가 페이지를 넘길 때 다시 풀지 않도록 프로세스마다 풀어 둘 보관본 수
+TRANSCRIPT_UNPACKED_ARCHIVE_CACHE_SIZE = 64
+
+# 게임 이벤트 푸시 (WebSocket ws/game/<id>/, long-poll api/game-events/<id>/). ASGI 서버에서 실행해야 함
+# 기본 LocalBroker는 프로세스 안에서만 팬아웃하므로, 여러 프로세스로 운영하면 공유 브로커 백엔드로 교체
+GAME_EVENTS = {
+    'BACKEND': 'game.event_broker.LocalBroker',
+    'HISTORY': 50,
+    'HISTORY_TOPICS': 1000,
+    'QUEUE_SIZE': 100,
+    'LONG_POLL_TIMEOUT': 25,
+}
+
+# 프롬프트 토큰 예산
+PROMPT_BUDGET = {
+    'HISTORY_TOKENS': 800,  # 그대로 포함할 최근 대화의 토큰 한도
+    'SUMMARY_TOKENS': 300,  # 누적 요약의 토큰 한도
+    'REPLY_MIN_TOKENS': 150,  # 응답 max_tokens 최소값
+    'REPLY_MAX_TOKENS': 600,  # 응답 max_tokens 최대값
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -161,7 +302,7 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 LOGIN_REDIRECT_URL = 'game:home'
-LOGIN_URL = 'login'
+LOGIN_URL = 'game:login'
 LOGOUT_REDIRECT_URL = 'game:home'
 
 # Internationalization
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'TRPG_Hero.settings')
 
 application = get_wsgi_application()
+
+# 워커 시작 시 DB 연결 풀을 미리 채움 (앱 로딩 이후에 import)
+from game.db_pool import open_connection_pools  # noqa: E402
+
+open_connection_pools()
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class GameConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'game'
+
+    def ready(self):
+        from django.core import checks
+
+        from . import signals  # noqa: F401
+        from .db_router import check_sticky_cache
+
+        checks.register(check_sticky_cache, checks.Tags.caches)
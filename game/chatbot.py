@@ -1,28 +1,75 @@
-from openai import OpenAI
 from django.conf import settings
+import asyncio
+import json
 import logging
 import random
 
+from asgiref.sync import sync_to_async
+
+from . import response_cache
+from .conversation_memory import get_recent_messages, get_summary, remember_turn, format_history, \
+    schedule_summary_update
+from .prompt_budget import budget, reply_max_tokens
+from .llm_transport import get_transport
+from .local_classifier import aget_classifier, get_classifier
+
 logger = logging.getLogger(__name__)
 
-client = OpenAI()
+SYSTEM_PROMPT = "You are a powerful Demon Lord in a text-based RPG. Your attitude changes based on your current resistance level. Respond in Korean."
 
-def generate_demon_lord_response(player_message, game_state, story_progress):
-    resistance = game_state.demon_lord_resistance
+FALLBACK_RESPONSES = [
+    "네 말따위는 신경 쓰지 않겠다. 세상의 종말은 피할 수 없어.",
+    "어리석은 인간이여, 네가 나를 막을 수 있다고 생각하나?",
+    "네 노력이 무색하군. 곧 모든 것이 끝날 것이다.",
+    "흥미롭군. 하지만 네 말은 결국 허공에 떠다니는 먼지에 불과해.",
+    "네가 뭐라고 지껄이든, 나의 계획은 이미 시작되었다."
+]
 
+# LLM이 지연 예산 안에 응답하지 못할 때 저항력 구간에 맞춰 사용할 기본 응답
+FALLBACK_RESPONSES_BY_ATTITUDE = {
+    "매우 적대적이고 거만한": FALLBACK_RESPONSES,
+    "적대적이지만 약간의 의심이 있는": [
+        "흥, 제법 그럴듯한 말이군. 하지만 그 정도로 내 마음이 흔들릴 거라 생각하지 마라.",
+        "네 말에 일리가 있을지도 모르지. 허나 나는 쉽게 믿지 않는다.",
+        "계속 지껄여 보아라. 네 말이 어디까지 가는지 지켜보겠다.",
+    ],
+    "경계하지만 듣는 자세를 가진": [
+        "...좋다, 네 이야기를 조금 더 들어보지. 하지만 경계를 늦추지는 않겠다.",
+        "네 말을 곱씹어 보고 있다. 계속 말해 보아라, 인간이여.",
+        "이상하군. 네 말이 귀에 거슬리지 않는다. 더 설명해 보아라.",
+    ],
+    "약간 동요하고 관심을 보이는": [
+        "네 말이 자꾸 마음에 걸리는군... 정말 다른 길이 있다는 것이냐?",
+        "흠... 그런 방법이 있을 줄은 몰랐다. 조금 더 자세히 말해 보아라.",
+        "어째서인지 네 말을 무시할 수가 없구나. 계속해 보아라.",
+    ],
+    "설득되기 시작하고 타협을 고려하는": [
+        "...네 말이 맞을지도 모르겠군. 타협의 여지를 생각해 보겠다.",
+        "좋다, 인간이여. 네가 말하는 평화라는 것을 한 번 믿어 보겠다.",
+        "세상을 지배하는 것 말고도 다른 길이 있을지도 모르겠구나. 함께 방법을 찾아보자.",
+    ],
+}
+
+
+def determine_attitude(resistance):
     # 저항력에 따른 마왕의 태도 결정
     if resistance > 80:
-        attitude = "매우 적대적이고 거만한"
+        return "매우 적대적이고 거만한"
     elif resistance > 60:
-        attitude = "적대적이지만 약간의 의심이 있는"
+        return "적대적이지만 약간의 의심이 있는"
     elif resistance > 40:
-        attitude = "경계하지만 듣는 자세를 가진"
+        return "경계하지만 듣는 자세를 가진"
     elif resistance > 20:
-        attitude = "약간 동요하고 관심을 보이는"
+        return "약간 동요하고 관심을 보이는"
     else:
-        attitude = "설득되기 시작하고 타협을 고려하는"
+        return "설득되기 시작하고 타협을 고려하는"
 
-    prompt = f"""
+
+def build_demon_lord_prompt(player_message, game_state, story_progress):
+    resistance = game_state.demon_lord_resistance
+    attitude = determine_attitude(resistance)
+
+    return f"""
     You are the Demon Lord in a text-based RPG. Respond to the player's message directly and in character.
     Your current attitude is {attitude}. Adjust your response accordingly.
     Your goal is still world domination, but as your resistance decreases, show more willingness to listen and consider compromise.
@@ -34,44 +81,47 @@ def generate_demon_lord_response(player_message, game_state, story_progress):
     - Player's persuasion level: {game_state.player_persuasion_level}/100
     - Current chapter: {story_progress}
 
+    Summary of the earlier conversation:
+    {get_summary(game_state) or '(none)'}
+
     Previous messages:
-    {game_state.previous_messages[-5:] if hasattr(game_state, 'previous_messages') else []}
+    {format_history(get_recent_messages(game_state))}
 
     Player: {player_message}
     Demon Lord:
     """
-    print(prompt)
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system",
-                 "content": "You are a powerful Demon Lord in a text-based RPG. Your attitude changes based on your current resistance level. Respond in Korean."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=3000,
-            n=1,
-            stop=None,
-            temperature=0.8,
-        )
 
-        demon_lord_response = response.choices[0].message.content.strip()
-        logger.info(f"Generated response: {demon_lord_response}")
+def _demon_lord_completion_kwargs(prompt, player_message, structured=False):
+    return {
+        "model": "gpt-3.5-turbo",
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": reply_max_tokens(player_message, structured),
+        "n": 1,
+        "stop": None,
+        "temperature": 0.8,
+    }
 
-        if len(demon_lord_response) < 10:
-            raise ValueError("Generated response is too short")
 
-    except Exception as e:
-        logger.error(f"Error generating response: {e}")
-        fallback_responses = [
-            "네 말따위는 신경 쓰지 않겠다. 세상의 종말은 피할 수 없어.",
-            "어리석은 인간이여, 네가 나를 막을 수 있다고 생각하나?",
-            "네 노력이 무색하군. 곧 모든 것이 끝날 것이다.",
-            "흥미롭군. 하지만 네 말은 결국 허공에 떠다니는 먼지에 불과해.",
-            "네가 뭐라고 지껄이든, 나의 계획은 이미 시작되었다."
-        ]
-        demon_lord_response = random.choice(fallback_responses)
+def fallback_demon_lord_response(game_state):
+    attitude = determine_attitude(game_state.demon_lord_resistance)
+    return random.choice(FALLBACK_RESPONSES_BY_ATTITUDE.get(attitude, FALLBACK_RESPONSES))
+
+
+def _validate_demon_lord_response(demon_lord_response):
+    demon_lord_response = demon_lord_response.strip()
+    logger.info(f"Generated response: {demon_lord_response}")
+
+    if len(demon_lord_response) < 10:
+        raise ValueError("Generated response is too short")
+    return demon_lord_response
+
+
+def finalize_demon_lord_response(player_message, demon_lord_response, game_state):
+    resistance = game_state.demon_lord_resistance
 
     # 감정 분석 (간단한 버전)
     if resistance > 60:
@@ -81,27 +131,297 @@ def generate_demon_lord_response(player_message, game_state, story_progress):
     else:
         sentiment = "positive" if "동의" in demon_lord_response or "이해" in demon_lord_response else "neutral"
 
-    # 이전 메시지 저장 (최대 10개)
-    if not hasattr(game_state, 'previous_messages'):
-        game_state.previous_messages = []
-    game_state.previous_messages.append(f"Player: {player_message}")
-    game_state.previous_messages.append(f"Demon Lord: {demon_lord_response}")
-    game_state.previous_messages = game_state.previous_messages[-10:]
+    # 최근 대화 기록 저장 (GameState.recent_messages, 최근 N턴), 밀려난 턴은 턴이 커밋된 뒤 백그라운드에서 요약에 반영
+    evicted = remember_turn(game_state, player_message, demon_lord_response)
+    schedule_summary_update(game_state, evicted, summarize_conversation)
 
     return demon_lord_response, {"length": len(demon_lord_response), "sentiment": sentiment}
+
+
+def summarize_conversation(previous_summary, transcript):
+    # 기존 요약에 새로 밀려난 대화를 반영한 누적 요약 생성
+    prompt = f"""
+    Update the running summary of a conversation between the player and the Demon Lord in a text-based RPG.
+    Keep the facts, promises, proposals and emotional shifts that matter for the rest of the game.
+    Respond in Korean with a short summary only.
+
+    Current summary:
+    {previous_summary or '(none)'}
+
+    New conversation to fold in:
+    {transcript}
+    """
+    response = get_transport().chat_completion(
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "system", "content": "You summarize RPG conversations concisely."},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=budget('SUMMARY_TOKENS'),
+        n=1,
+        temperature=0.3,
+    )
+    return response.choices[0].message.content.strip()
+
+
+def _response_cache_key(player_message, game_state, story_progress, namespace='reply'):
+    # 정규화된 플레이어 메시지 + 저항력 기반 태도 구간 + 챕터를 키로 사용
+    chapter = getattr(story_progress, 'current_chapter', story_progress)
+    attitude = determine_attitude(game_state.demon_lord_resistance)
+    return response_cache.make_cache_key(namespace, player_message, attitude, chapter)
+
+
+def generate_demon_lord_response(player_message, game_state, story_progress):
+    cache_key = _response_cache_key(player_message, game_state, story_progress)
+    demon_lord_response = response_cache.get_cached_response(cache_key)
+    if demon_lord_response is not None:
+        return finalize_demon_lord_response(player_message, demon_lord_response, game_state)
+
+    prompt = build_demon_lord_prompt(player_message, game_state, story_progress)
+
+    try:
+        response = get_transport().chat_completion(**_demon_lord_completion_kwargs(prompt, player_message))
+        demon_lord_response = _validate_demon_lord_response(response.choices[0].message.content)
+        response_cache.store_response(cache_key, demon_lord_response)
+
+    except Exception as e:
+        logger.error(f"Error generating response: {e}")
+        demon_lord_response = fallback_demon_lord_response(game_state)
+
+    return finalize_demon_lord_response(player_message, demon_lord_response, game_state)
+
+
+async def agenerate_demon_lord_response(player_message, game_state, story_progress):
+    # generate_demon_lord_response의 비동기 버전 (ASGI 워커가 LLM 응답을 기다리는 동안 다른 턴을 처리)
+    cache_key = _response_cache_key(player_message, game_state, story_progress)
+    demon_lord_response = await response_cache.aget_cached_response(cache_key)
+    if demon_lord_response is not None:
+        return finalize_demon_lord_response(player_message, demon_lord_response, game_state)
+
+    prompt = build_demon_lord_prompt(player_message, game_state, story_progress)
+
+    try:
+        response = await get_transport().achat_completion(**_demon_lord_completion_kwargs(prompt, player_message))
+        demon_lord_response = _validate_demon_lord_response(response.choices[0].message.content)
+        await response_cache.astore_response(cache_key, demon_lord_response)
+
+    except Exception as e:
+        logger.error(f"Error generating response: {e}")
+        demon_lord_response = fallback_demon_lord_response(game_state)
+
+    return finalize_demon_lord_response(player_message, demon_lord_response, game_state)
+
+
+async def astream_demon_lord_response(player_message, game_state, story_progress):
+    # 마왕의 응답을 토큰 단위로 흘려보냄. 스트림이 끝난 뒤 finalize_demon_lord_response로 마무리해야 함
+    cache_key = _response_cache_key(player_message, game_state, story_progress)
+    cached_response = await response_cache.aget_cached_response(cache_key)
+    if cached_response is not None:
+        yield cached_response
+        return
+
+    prompt = build_demon_lord_prompt(player_message, game_state, story_progress)
+    streamed = []
+
+    try:
+        stream = get_transport().astream_chat_completion(**_demon_lord_completion_kwargs(prompt, player_message))
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                streamed.append(delta)
+                yield delta
+
+        # 정상적으로 끝난 스트림만 캐시에 저장
+        await response_cache.astore_response(cache_key, _validate_demon_lord_response(''.join(streamed)))
+
+    except Exception as e:
+        logger.error(f"Error streaming response: {e}")
+
+    # 토큰이 하나도 오지 않았으면 기본 응답으로 대체 (스트리밍 도중 끊긴 경우는 받은 만큼 유지)
+    if not streamed:
+        yield fallback_demon_lord_response(game_state)
+
+
+DEFAULT_PLAYER_ANALYSIS = {
+    "persuasion_strength": 0,
+    "emotional_impact": "중립적",
+    "primary_approach": "알 수 없음"
+}
+
+
+def parse_player_analysis(data):
+    # JSON으로 받은 분석 결과를 게임 로직이 쓰는 형태로 정규화
+    if not isinstance(data, dict):
+        return dict(DEFAULT_PLAYER_ANALYSIS)
+
+    try:
+        persuasion_strength = int(round(float(data.get("persuasion_strength", 0))))
+    except (ValueError, TypeError):
+        persuasion_strength = 0
+
+    return {
+        "persuasion_strength": max(0, min(10, persuasion_strength)),
+        "emotional_impact": str(data.get("emotional_impact") or DEFAULT_PLAYER_ANALYSIS["emotional_impact"]),
+        "primary_approach": str(data.get("primary_approach") or DEFAULT_PLAYER_ANALYSIS["primary_approach"])
+    }
+
+
+def _parse_json_content(content):
+    data = json.loads(content)
+    if not isinstance(data, dict):
+        raise ValueError("Structured response is not a JSON object")
+    return data
+
+
+def build_demon_lord_turn_prompt(player_message, game_state, story_progress):
+    return build_demon_lord_prompt(player_message, game_state, story_progress) + """
+    Also analyze the player's message. Reply with a single JSON object only, in this exact shape:
+    {
+        "reply": "<the Demon Lord's in-character response in Korean>",
+        "analysis": {
+            "emotional_impact": "<매우 긍정적|긍정적|중립적|부정적|매우 부정적>",
+            "persuasion_strength": <integer 0-10>,
+            "primary_approach": "<논리적|감정적|단호한|공감적>"
+        }
+    }
+    """
+
+
+def _demon_lord_turn_completion_kwargs(prompt, player_message):
+    kwargs = _demon_lord_completion_kwargs(prompt, player_message, structured=True)
+    kwargs["response_format"] = {"type": "json_object"}
+    return kwargs
+
+
+def _parse_demon_lord_turn(content):
+    data = _parse_json_content(content)
+    return {
+        "reply": _validate_demon_lord_response(str(data.get("reply", ""))),
+        "player_analysis": parse_player_analysis(data.get("analysis")),
+    }
+
+
+def _finalize_demon_lord_turn(player_message, turn, game_state):
+    demon_lord_response, demon_lord_analysis = finalize_demon_lord_response(
+        player_message, turn["reply"], game_state
+    )
+    return demon_lord_response, demon_lord_analysis, turn["player_analysis"]
+
+
+def _fallback_demon_lord_turn(game_state):
+    return {
+        "reply": fallback_demon_lord_response(game_state),
+        "player_analysis": dict(DEFAULT_PLAYER_ANALYSIS),
+    }
+
+
+def generate_demon_lord_turn(player_message, game_state, story_progress):
+    # 마왕의 응답과 플레이어 메시지 분석을 한 번의 호출(JSON 응답)로 함께 생성
+    if _use_local_classifier():
+        # 분석은 로컬 분석기(배치 처리)에 먼저 넣어 두고, LLM에는 응답만 요청
+        pending_analysis = _submit_local_analysis(player_message)
+        demon_lord_response, demon_lord_analysis = generate_demon_lord_response(
+            player_message, game_state, story_progress)
+        return demon_lord_response, demon_lord_analysis, _local_analysis_result(pending_analysis)
+
+    cache_key = _response_cache_key(player_message, game_state, story_progress, namespace='turn')
+    turn = response_cache.get_cached_response(cache_key)
+    if turn is not None:
+        return _finalize_demon_lord_turn(player_message, turn, game_state)
+
+    prompt = build_demon_lord_turn_prompt(player_message, game_state, story_progress)
+
+    try:
+        response = get_transport().chat_completion(**_demon_lord_turn_completion_kwargs(prompt, player_message))
+        turn = _parse_demon_lord_turn(response.choices[0].message.content)
+        response_cache.store_response(cache_key, turn)
+
+    except Exception as e:
+        logger.error(f"Error generating turn: {e}")
+        turn = _fallback_demon_lord_turn(game_state)
+
+    return _finalize_demon_lord_turn(player_message, turn, game_state)
+
+
+async def agenerate_demon_lord_turn(player_message, game_state, story_progress):
+    if _use_local_classifier():
+        player_analysis, (demon_lord_response, demon_lord_analysis) = await asyncio.gather(
+            aanalyze_player_message(player_message),
+            agenerate_demon_lord_response(player_message, game_state, story_progress),
+        )
+        return demon_lord_response, demon_lord_analysis, player_analysis
+
+    cache_key = _response_cache_key(player_message, game_state, story_progress, namespace='turn')
+    turn = await response_cache.aget_cached_response(cache_key)
+    if turn is not None:
+        return _finalize_demon_lord_turn(player_message, turn, game_state)
+
+    prompt = build_demon_lord_turn_prompt(player_message, game_state, story_progress)
+
+    try:
+        response = await get_transport().achat_completion(**_demon_lord_turn_completion_kwargs(prompt, player_message))
+        turn = _parse_demon_lord_turn(response.choices[0].message.content)
+        await response_cache.astore_response(cache_key, turn)
+
+    except Exception as e:
+        logger.error(f"Error generating turn: {e}")
+        turn = _fallback_demon_lord_turn(game_state)
+
+    return _finalize_demon_lord_turn(player_message, turn, game_state)
+
+
+def _use_local_classifier():
+    return getattr(settings, 'PLAYER_ANALYSIS_BACKEND', 'llm') == 'local'
+
+
+def _submit_local_analysis(message):
+    # 분석기를 불러오지 못하면 None (결과 대신 기본 분석 사용)
+    try:
+        return get_classifier().submit(message)
+    except Exception as e:
+        logger.error(f"플레이어 메시지 분석 중 오류 발생: {e}")
+        return None
+
+
+def _local_analysis_result(pending_analysis):
+    if pending_analysis is None:
+        return dict(DEFAULT_PLAYER_ANALYSIS)
+    try:
+        return pending_analysis.result()
+    except Exception as e:
+        logger.error(f"플레이어 메시지 분석 중 오류 발생: {e}")
+        return dict(DEFAULT_PLAYER_ANALYSIS)
+
+
+async def aanalyze_player_message(message):
+    if _use_local_classifier():
+        try:
+            return await (await aget_classifier()).aclassify(message)
+        except Exception as e:
+            logger.error(f"플레이어 메시지 분석 중 오류 발생: {e}")
+            return dict(DEFAULT_PLAYER_ANALYSIS)
+    return await sync_to_async(analyze_player_message, thread_sensitive=False)(message)
+
+
 def analyze_player_message(message):
+    # PLAYER_ANALYSIS_BACKEND가 'local'이면 네트워크 호출 없이 로컬 CPU 분석기 사용
+    if _use_local_classifier():
+        return _local_analysis_result(_submit_local_analysis(message))
+
     prompt = f"""
     다음 메시지의 감정과 설득력을 분석하세요:
     "{message}"
 
-    분석 결과를 다음 형식으로 제공하세요:
-    - 감정 상태: [매우 긍정적/긍정적/중립적/부정적/매우 부정적]
-    - 설득력: [0-10 사이의 숫자]
-    - 주요 접근 방식: [설득/위협]
+    분석 결과를 다음 키를 가진 JSON 객체로만 제공하세요:
+    - "emotional_impact": "매우 긍정적" | "긍정적" | "중립적" | "부정적" | "매우 부정적"
+    - "persuasion_strength": 0-10 사이의 정수
+    - "primary_approach": "설득" | "위협"
     """
 
     try:
-        response = client.chat.completions.create(
+        response = get_transport().chat_completion(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system",
@@ -112,35 +432,10 @@ def analyze_player_message(message):
             n=1,
             stop=None,
             temperature=0.5,
+            response_format={"type": "json_object"},
         )
 
-        # 응답 처리
-        generated_text = response.choices[0].message.content
-
-        analysis = response.choices[0].message['content'].strip()
-
-        # 분석 결과 파싱
-        emotional_impact = "중립적"
-        persuasion_strength = 0
-        primary_approach = "알 수 없음"
-
-        for line in analysis.split('\n'):
-            if '감정 상태:' in line:
-                emotional_impact = line.split(':')[1].strip()
-            elif '설득력:' in line:
-                persuasion_strength = int(line.split(':')[1].strip())
-            elif '주요 접근 방식:' in line:
-                primary_approach = line.split(':')[1].strip()
-
-        return {
-            "persuasion_strength": persuasion_strength,
-            "emotional_impact": emotional_impact,
-            "primary_approach": primary_approach
-        }
+        return parse_player_analysis(_parse_json_content(response.choices[0].message.content))
     except Exception as e:
         logger.error(f"플레이어 메시지 분석 중 오류 발생: {e}")
-        return {
-            "persuasion_strength": 0,
-            "emotional_impact": "중립적",
-            "primary_approach": "알 수 없음"
-        }
\ No newline at end of file
+        return dict(DEFAULT_PLAYER_ANALYSIS)
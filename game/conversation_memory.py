@@ -0,0 +1,114 @@
+# game/conversation_memory.py
+import contextvars
+import logging
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .prompt_budget import budget, split_by_budget, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_TURNS = 5
+
+SPEAKER_LABELS = {
+    'player': 'Player',
+    'demon_lord': 'Demon Lord',
+}
+
+# 요약은 응답 경로 밖에서 처리 (세션별로 순서대로 실행)
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='conversation-summary')
+# 요약 중인 세션의 Lock만 유지 (실행 중인 작업이 참조를 놓으면 항목도 사라짐)
+_summary_locks = weakref.WeakValueDictionary()
+_summary_locks_guard = threading.Lock()
+
+
+def memory_size():
+    # 턴 하나 = 플레이어 메시지 + 마왕 응답
+    return getattr(settings, 'CONVERSATION_MEMORY_TURNS', DEFAULT_MEMORY_TURNS) * 2
+
+
+def get_recent_messages(game_state):
+    messages = getattr(game_state, 'recent_messages', None)
+    return messages if isinstance(messages, list) else []
+
+
+def get_summary(game_state):
+    return getattr(game_state, 'conversation_summary', '') or ''
+
+
+def remember_turn(game_state, player_message, demon_lord_response):
+    # GameState.recent_messages에 최근 N턴(토큰 예산 이내)만 유지하고, 밀려난 메시지를 반환
+    messages = get_recent_messages(game_state) + [
+        {'speaker': 'player', 'content': player_message},
+        {'speaker': 'demon_lord', 'content': demon_lord_response},
+    ]
+    kept, evicted = split_by_budget(messages, memory_size(), budget('HISTORY_TOKENS'))
+    game_state.recent_messages = kept
+    return evicted
+
+
+def format_history(messages):
+    return "\n".join(
+        f"{SPEAKER_LABELS.get(message.get('speaker'), message.get('speaker'))}: {message.get('content')}"
+        for message in messages
+    )
+
+
+def _session_lock(game_state_id):
+    with _summary_locks_guard:
+        return _summary_locks.setdefault(game_state_id, threading.Lock())
+
+
+def _fold_into_summary(game_state_id, evicted, summarizer):
+    from .models import GameState
+
+    close_old_connections()
+    try:
+        with _session_lock(game_state_id):
+            previous_summary = GameState.objects.filter(pk=game_state_id).values_list(
+                'conversation_summary', flat=True).first() or ''
+            try:
+                summary = summarizer(previous_summary, format_history(evicted))
+            except Exception as e:
+                # 요약 실패 시 밀려난 대화를 그대로 덧붙여 정보가 사라지지 않게 함
+                logger.warning(f"대화 요약 생성 실패, 원문을 이어 붙입니다: {e}")
+                summary = "\n".join(filter(None, [previous_summary, format_history(evicted)]))
+            summary = truncate_to_tokens(summary, budget('SUMMARY_TOKENS'))
+            GameState.objects.filter(pk=game_state_id).update(conversation_summary=summary)
+    except Exception as e:
+        logger.error(f"대화 요약 저장 중 오류 발생. GameState {game_state_id}: {e}")
+    finally:
+        close_old_connections()
+
+
+def schedule_summary_update(game_state, evicted, summarizer):
+    # 최근 기록에서 밀려난 턴을 game_state에 보관만 해 둠
+    # 실제 요약 반영은 recent_messages를 저장한 턴이 커밋된 뒤 (commit_summary_update)
+    if not evicted or game_state.pk is None:
+        return
+    if not getattr(settings, 'CONVERSATION_SUMMARY_ENABLED', True):
+        return
+    game_state._pending_summary = (list(evicted), summarizer)
+
+
+def commit_summary_update(game_state, using):
+    """
+    recent_messages를 저장하는 트랜잭션 안에서 호출. 턴이 커밋된 경우에만 백그라운드에서 누적 요약에 반영하고,
+    롤백되거나 다른 턴과 충돌(409)하면 밀려난 턴은 버려짐.
+    """
+    pending = game_state.__dict__.pop('_pending_summary', None)
+    if pending is None:
+        return
+    evicted, summarizer = pending
+    game_state_id = game_state.pk
+
+    def submit():
+        # 요청의 DB 라우팅 상태(샤드)를 백그라운드 스레드에서도 그대로 쓰도록 컨텍스트를 넘김
+        context = contextvars.copy_context()
+        _summary_executor.submit(context.run, _fold_into_summary, game_state_id, evicted, summarizer)
+
+    transaction.on_commit(submit, using=using)
@@ -0,0 +1,66 @@
+# game/db_pool.py
+import threading
+import time
+
+from django.db import connections
+
+# 초당 연결 요청 수 계산용: alias별 직전 (측정 시각, 누적 요청 수)
+_last_samples = {}
+_samples_lock = threading.Lock()
+
+
+def _get_pool(alias):
+    # OPTIONS['pool']을 설정한 PostgreSQL DB만 풀이 있음 (그 외에는 None)
+    return getattr(connections[alias], 'pool', None)
+
+
+def open_connection_pools():
+    # 워커 시작 시 풀을 열어 min_size만큼 미리 연결해 둠 (첫 요청이 연결 수립을 기다리지 않도록)
+    for alias in connections:
+        pool = _get_pool(alias)
+        if pool is not None:
+            pool.open(wait=False)
+
+
+def pool_metrics(alias):
+    """
+    alias DB 연결 풀의 현재 상태. 풀을 쓰지 않는 DB면 None.
+    in_use: 사용 중인 연결 수, waiting: 연결을 기다리는 요청 수,
+    wait_ms_avg: 요청당 평균 대기 시간, checkouts_per_sec: 직전 측정 이후 초당 연결 요청 수
+    """
+    pool = _get_pool(alias)
+    if pool is None:
+        return None
+
+    stats = pool.get_stats()
+    requests_num = stats.get('requests_num', 0)
+    now = time.monotonic()
+    with _samples_lock:
+        previous = _last_samples.get(alias)
+        _last_samples[alias] = (now, requests_num)
+    checkouts_per_sec = None
+    if previous is not None and now > previous[0]:
+        checkouts_per_sec = round((requests_num - previous[1]) / (now - previous[0]), 2)
+
+    pool_size = stats.get('pool_size', 0)
+    return {
+        'size': pool_size,
+        'min_size': stats.get('pool_min'),
+        'max_size': stats.get('pool_max'),
+        'in_use': pool_size - stats.get('pool_available', 0),
+        'available': stats.get('pool_available', 0),
+        'waiting': stats.get('requests_waiting', 0),
+        'checkouts': requests_num,
+        'checkouts_per_sec': checkouts_per_sec,
+        'queued': stats.get('requests_queued', 0),
+        'wait_ms_total': stats.get('requests_wait_ms', 0),
+        'wait_ms_avg': round(stats.get('requests_wait_ms', 0) / requests_num, 2) if requests_num else 0,
+        'timeouts': stats.get('requests_errors', 0),
+        'bad_returns': stats.get('returns_bad', 0),
+        'connections_opened': stats.get('connections_num', 0),
+        'connections_lost': stats.get('connections_lost', 0),
+    }
+
+
+def all_pool_metrics():
+    return {alias: pool_metrics(alias) for alias in connections}
@@ -0,0 +1,265 @@
+# game/db_router.py
+import hashlib
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.views import redirect_to_login
+from django.core import checks
+from django.core.cache import caches
+from django.core.signals import request_finished
+from django.db import connections, router
+from django.utils.connection import ConnectionDoesNotExist
+from django.utils.decorators import sync_and_async_middleware
+
+GAME_APP_LABEL = 'game'
+
+DEFAULT_ROUTING_SETTINGS = {
+    'PRIMARY': 'default',  # game 앱 외의 모델(auth, sessions 등)과 샤딩하지 않을 때의 game 모델이 쓰는 DB
+    'REPLICAS': {},  # {primary 또는 샤드 alias: [읽기 전용 복제본 alias, ...]}
+    'SHARDS': [],  # 비어 있지 않으면 Player/GameSession과 하위 모델을 플레이어(user id) 해시로 나눠 저장
+    'STICKY_SECONDS': 5,  # 쓰기 직후 같은 사용자의 읽기를 primary로 보내는 시간 (복제 지연 대비)
+    'STICKY_CACHE_ALIAS': 'default',  # 모든 워커가 함께 보는 공유 캐시(Redis/Memcached 등)여야 함
+}
+
+# 프로세스마다 따로인 캐시: 다른 워커로 간 다음 요청은 고정 표시를 보지 못함
+_PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def get_routing_settings():
+    return {**DEFAULT_ROUTING_SETTINGS, **getattr(settings, 'GAME_DATABASE_ROUTING', {})}
+
+
+class ShardNotSelectedError(RuntimeError):
+    pass
+
+
+class RoutingState:
+    # 요청(또는 use_shard 블록) 하나의 라우팅 상태. 스레드로 넘어간 컨텍스트에서도 같은 객체를 공유함
+    def __init__(self, user_id=None, shard=None, pinned=False):
+        self.user_id = user_id
+        self.shard = shard
+        self.pinned = pinned
+        self.wrote = False
+
+
+_routing_state = ContextVar('game_db_routing_state', default=None)
+
+
+def current_routing_state():
+    return _routing_state.get()
+
+
+def shard_for_user(user_id, options=None):
+    # 프로세스마다 달라지는 hash() 대신 고정된 해시로 샤드를 고름
+    shards = (options or get_routing_settings())['SHARDS']
+    if not shards or user_id is None:
+        return None
+    digest = hashlib.sha1(str(user_id).encode('utf-8')).digest()
+    return shards[int.from_bytes(digest[:8], 'big') % len(shards)]
+
+
+def shard_aliases():
+    # 관리 명령 등에서 모든 샤드를 돌 때 사용. 샤딩하지 않으면 [None] (use_shard(None)은 아무것도 바꾸지 않음)
+    return list(get_routing_settings()['SHARDS']) or [None]
+
+
+@contextmanager
+def use_shard(alias):
+    # 요청 밖(관리 명령, 백그라운드 작업)에서 game 모델을 특정 샤드로 보냄
+    if alias is None:
+        yield
+        return
+    token = _routing_state.set(RoutingState(shard=alias))
+    try:
+        yield
+    finally:
+        _routing_state.reset(token)
+
+
+def activate_for_user(user_id, pinned=False):
+    # 요청마다 새로 설정하므로 이전 요청의 상태가 남아 있어도 덮어씀
+    state = RoutingState(user_id=user_id, shard=shard_for_user(user_id), pinned=pinned)
+    _routing_state.set(state)
+    return state
+
+
+def game_db():
+    # 현재 컨텍스트에서 game 모델을 쓰는 DB (transaction.atomic/on_commit의 using에 사용)
+    from .models import GameSession
+
+    return router.db_for_write(GameSession)
+
+
+def shard_cache_prefix():
+    # 샤드마다 id가 따로 매겨지므로 id로 만드는 캐시 키/이벤트 토픽에 샤드를 붙임
+    state = _routing_state.get()
+    return f'{state.shard}:' if state is not None and state.shard else ''
+
+
+def _sticky_key(user_id):
+    return f'db-sticky:{user_id}'
+
+
+def is_pinned_to_primary(user_id, options=None):
+    options = options or get_routing_settings()
+    if user_id is None or not options['STICKY_SECONDS'] or not options['REPLICAS']:
+        return False
+    return caches[options['STICKY_CACHE_ALIAS']].get(_sticky_key(user_id)) is not None
+
+
+async def ais_pinned_to_primary(user_id, options=None):
+    options = options or get_routing_settings()
+    if user_id is None or not options['STICKY_SECONDS'] or not options['REPLICAS']:
+        return False
+    return await caches[options['STICKY_CACHE_ALIAS']].aget(_sticky_key(user_id)) is not None
+
+
+def _remember_write(sender=None, **kwargs):
+    # 쓰기가 있었던 요청이 끝나면(스트리밍 응답 포함) 잠시 그 사용자의 읽기를 primary로 고정
+    state = _routing_state.get()
+    if state is None or not state.wrote or state.user_id is None:
+        return
+    options = get_routing_settings()
+    if options['STICKY_SECONDS'] and options['REPLICAS']:
+        caches[options['STICKY_CACHE_ALIAS']].set(_sticky_key(state.user_id), 1, options['STICKY_SECONDS'])
+
+
+request_finished.connect(_remember_write, dispatch_uid='game_db_router_remember_write')
+
+
+def _in_atomic_block(alias):
+    try:
+        return connections[alias].in_atomic_block
+    except ConnectionDoesNotExist:
+        return False
+
+
+class GameDatabaseRouter:
+    """
+    읽기는 복제본, 쓰기는 primary로 보내는 라우터.
+    SHARDS를 설정하면 game 앱 모델(Player, GameSession과 하위 모델)은 플레이어의 user id 해시로 고른 샤드에 저장되고,
+    auth/sessions 등 나머지 앱은 항상 PRIMARY를 씀. 샤드는 요청의 로그인 사용자(database_routing_middleware)나
+    use_shard()로 정해짐.
+    """
+
+    def __init__(self, options=None):
+        self.options = options or get_routing_settings()
+        self.replica_of = {
+            replica: primary
+            for primary, replicas in self.options['REPLICAS'].items()
+            for replica in replicas
+        }
+
+    def _is_game_model(self, model):
+        return model._meta.app_label == GAME_APP_LABEL
+
+    def _home(self, model):
+        if not self._is_game_model(model) or not self.options['SHARDS']:
+            return self.options['PRIMARY']
+        state = _routing_state.get()
+        if state is None or state.shard is None:
+            raise ShardNotSelectedError(
+                f"{model._meta.label}: 샤드가 정해지지 않았습니다. 로그인한 요청 안에서 실행하거나 use_shard()로 감싸주세요."
+            )
+        return state.shard
+
+    def _instance_db(self, model, hints):
+        # 이미 읽어온 game 모델 객체와 관계된 조회/저장은 그 객체가 있던 DB(샤드)를 따라감
+        instance = hints.get('instance')
+        if instance is not None and self._is_game_model(instance) and self._is_game_model(model):
+            return instance._state.db
+        return None
+
+    def db_for_read(self, model, **hints):
+        if not self._is_game_model(model):
+            return self.options['PRIMARY']
+        instance_db = self._instance_db(model, hints)
+        if instance_db:
+            return instance_db
+        home = self._home(model)
+        replicas = self.options['REPLICAS'].get(home)
+        state = _routing_state.get()
+        # read-your-writes: 이 요청/사용자가 방금 쓴 내용은 primary에서 읽음
+        if not replicas or _in_atomic_block(home) or (state is not None and (state.pinned or state.wrote)):
+            return home
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None and self._is_game_model(model):
+            state.wrote = True
+        instance_db = self._instance_db(model, hints)
+        if instance_db:
+            return self.replica_of.get(instance_db, instance_db)
+        return self._home(model)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Player.user처럼 샤드의 game 모델이 primary의 사용자를 가리키는 관계는 id로만 연결됨 (db_constraint=False)
+        if not (self._is_game_model(obj1) and self._is_game_model(obj2)):
+            return True
+        db1, db2 = obj1._state.db, obj2._state.db
+        return self.replica_of.get(db1, db1) == self.replica_of.get(db2, db2)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in self.replica_of:
+            return False
+        if self.options['SHARDS']:
+            if app_label == GAME_APP_LABEL:
+                return db in self.options['SHARDS']
+            # 샤드에도 나머지 앱 테이블을 만들어 둠 (초기 마이그레이션의 Player.user 외래 키가 참조. 0012에서 제약 제거)
+            return db == self.options['PRIMARY'] or db in self.options['SHARDS']
+        return None
+
+
+def check_sticky_cache(app_configs=None, **kwargs):
+    # 여러 워커로 운영하면서 복제본을 쓰면 read-your-writes 고정이 공유 캐시에 있어야 함
+    options = get_routing_settings()
+    if not options['REPLICAS'] or not options['STICKY_SECONDS']:
+        return []
+    alias = options['STICKY_CACHE_ALIAS']
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in _PROCESS_LOCAL_CACHE_BACKENDS:
+        return []
+    return [checks.Warning(
+        f"GAME_DATABASE_ROUTING['STICKY_CACHE_ALIAS'] 캐시 '{alias}'가 프로세스별 캐시({backend})입니다.",
+        hint="워커가 여럿이면 쓰기 직후의 읽기가 복제본으로 갈 수 있으니 Redis/Memcached 등 공유 캐시를 지정하세요.",
+        id='game.W001',
+    )]
+
+
+def _shard_not_selected_response(request, exception):
+    # 샤드를 고를 사용자가 없는 요청(비로그인)이 game 모델에 닿으면 500 대신 로그인 페이지로 보냄
+    if isinstance(exception, ShardNotSelectedError):
+        return redirect_to_login(request.get_full_path())
+    return None
+
+
+@sync_and_async_middleware
+def database_routing_middleware(get_response):
+    """
+    요청의 로그인 사용자로 샤드를 정하고, 최근에 쓰기를 한 사용자면 읽기를 primary로 고정.
+    세션에서 user id만 읽으므로 사용자 조회 쿼리는 추가되지 않음. SessionMiddleware 뒤에 둬야 함.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            user_id = await request.session.aget(SESSION_KEY)
+            activate_for_user(user_id, pinned=await ais_pinned_to_primary(user_id))
+            return await get_response(request)
+
+        markcoroutinefunction(middleware)
+    else:
+        def middleware(request):
+            user_id = request.session.get(SESSION_KEY)
+            activate_for_user(user_id, pinned=is_pinned_to_primary(user_id))
+            return get_response(request)
+
+    middleware.process_exception = _shard_not_selected_response
+    return middleware
+
@@ -0,0 +1,54 @@
+# game/db_utils.py
+from django.db import connections, transaction
+from django.db.models.sql.subqueries import UpdateQuery
+
+
+def supports_update_returning(connection):
+    # UPDATE ... RETURNING: PostgreSQL, SQLite 3.35+
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35, 0)
+    return False
+
+
+def update_returning(queryset, returning, **values):
+    """
+    queryset에 해당하는 행을 values(F()/함수 표현식 가능)로 갱신하고, 갱신된 행의 returning 필드 값을
+    dict 목록으로 반환. 가능한 DB에서는 UPDATE ... RETURNING 한 문장으로 처리.
+    """
+    model = queryset.model
+    # 읽기용 라우팅(복제본)이 아니라 쓰기 DB로 보냄 (QuerySet.update와 같은 방식)
+    queryset = queryset.all()
+    queryset._for_write = True
+    fields = [model._meta.get_field(name) for name in returning]
+    connection = connections[queryset.db]
+
+    if not supports_update_returning(connection):
+        # RETURNING을 지원하지 않는 DB: 대상 행을 잠근 뒤 UPDATE 후 다시 읽음
+        with transaction.atomic(using=queryset.db):
+            pks = list(queryset.select_for_update().values_list('pk', flat=True))
+            if not pks:
+                return []
+            model._base_manager.using(queryset.db).filter(pk__in=pks).update(**values)
+            return list(model._base_manager.using(queryset.db).filter(pk__in=pks).values(*returning))
+
+    query = queryset.query.chain(UpdateQuery)
+    query.add_update_values(values)
+    query.annotations = {}
+    compiler = query.get_compiler(using=queryset.db)
+    compiler.pre_sql_setup()
+    sql, params = compiler.as_sql()
+    if not sql:
+        return []
+    sql += ' RETURNING ' + ', '.join(connection.ops.quote_name(field.column) for field in fields)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    # JSONField 등은 일반 조회와 같은 변환기를 거쳐 Python 값으로 변환
+    converters = compiler.get_converters([field.get_col(model._meta.db_table) for field in fields])
+    if converters:
+        rows = compiler.apply_converters(rows, converters)
+    return [dict(zip(returning, row)) for row in rows]
@@ -0,0 +1,198 @@
+# game/dialogue_analyzer.py
+import re
+from collections import Counter, deque
+
+import numpy as np
+
+_SENTENCE_RE = re.compile(r'\w+[.!?]')
+
+
+def _is_word_char(char):
+    # re의 \w 판정과 동일 (유니코드 문자/숫자 + '_')
+    return char.isalnum() or char == '_'
+
+
+def _parse_emotion_pattern(pattern):
+    # 감정 패턴은 리터럴을 '|'로 나열하고 필요하면 앞에 \b를 붙이는 형태만 지원 (예: r'\b기쁘|즐겁|행복')
+    alternatives = []
+    for alternative in pattern.split('|'):
+        needs_boundary = alternative.startswith(r'\b')
+        literal = alternative[2:] if needs_boundary else alternative
+        if not literal or re.escape(literal) != literal:
+            raise ValueError(f"Emotion pattern must be literal alternatives: {pattern!r}")
+        alternatives.append((literal, needs_boundary))
+    return alternatives
+
+
+class AhoCorasick:
+    # 모든 키워드를 한 번에 찾는 오토마톤. 검색 비용은 사전 크기와 무관하게 메시지 길이에 비례
+
+    def __init__(self, terms):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for term_id, term in enumerate(terms):
+            state = 0
+            for char in term:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(term_id)
+
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in self._goto[state].items():
+                pending.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text):
+        # (끝 위치(미포함), term_id)를 끝 위치 순서대로 반환
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for term_id in output[state]:
+                yield index + 1, term_id
+
+
+class DialogueAnalyzer:
+    # keywords: {단어: 점수}, emotion_patterns: {패턴: (감정, 점수)}, branches: {스토리 분기: [단어, ...]}
+    def __init__(self, keywords, emotion_patterns, branches=None):
+        self.keywords = tuple(keywords.items())
+        self.emotions = tuple(emotion_patterns.values())
+        self.branches = tuple((branches or {}).items())
+
+        # 같은 리터럴이 여러 키워드/감정 패턴에 걸릴 수 있으므로 리터럴별로 대상 목록을 보관
+        literals = {}
+        for index, (word, _) in enumerate(self.keywords):
+            literals.setdefault(word, []).append(('keyword', index, 0, False))
+        for index, pattern in enumerate(emotion_patterns):
+            for order, (literal, needs_boundary) in enumerate(_parse_emotion_pattern(pattern)):
+                literals.setdefault(literal, []).append(('emotion', index, order, needs_boundary))
+        # 스토리 분기 단어는 점수가 없어도 같은 오토마톤에서 함께 찾음
+        for index, (_, terms) in enumerate(self.branches):
+            for term in terms:
+                literals.setdefault(term, []).append(('branch', index, 0, False))
+
+        self._terms = tuple(literals)
+        self._targets = tuple(tuple(literals[term]) for term in self._terms)
+        self._automaton = AhoCorasick(self._terms)
+
+    def scan(self, message):
+        # 메시지를 한 번만 훑어 키워드별 등장 횟수, 감정 패턴별 매치 수, 등장한 스토리 분기를 계산
+        keyword_counts = [0] * len(self.keywords)
+        keyword_ends = [0] * len(self.keywords)
+        emotion_candidates = [[] for _ in self.emotions]
+        branch_hits = [False] * len(self.branches)
+
+        for end, term_id in self._automaton.iter_matches(message):
+            start = end - len(self._terms[term_id])
+            for kind, index, order, needs_boundary in self._targets[term_id]:
+                if kind == 'keyword':
+                    # str.count와 같이 같은 키워드끼리는 겹치지 않게 셈
+                    if start >= keyword_ends[index]:
+                        keyword_counts[index] += 1
+                        keyword_ends[index] = end
+                elif kind == 'branch':
+                    branch_hits[index] = True
+                else:
+                    if needs_boundary:
+                        before = _is_word_char(message[start - 1]) if start > 0 else False
+                        if before == _is_word_char(message[start]):
+                            continue
+                    emotion_candidates[index].append((start, order, end))
+
+        # re.findall과 같이 왼쪽부터, 같은 위치에서는 먼저 나열된 대안을 우선해 겹치지 않게 셈
+        emotion_counts = []
+        for candidates in emotion_candidates:
+            count = 0
+            position = 0
+            for start, _, end in sorted(candidates):
+                if start >= position:
+                    count += 1
+                    position = end
+            emotion_counts.append(count)
+
+        return keyword_counts, emotion_counts, branch_hits
+
+    def analyze(self, message):
+        keyword_counts, emotion_counts, _ = self.scan(message)
+
+        score = 0
+        used_keywords = Counter()
+        for (word, value), count in zip(self.keywords, keyword_counts):
+            score += count * value
+            if count > 0:
+                used_keywords[word] = count
+
+        emotions = Counter()
+        total_emotion_score = 0
+        for (emotion, value), count in zip(self.emotions, emotion_counts):
+            if count:
+                emotions[emotion] += count
+                total_emotion_score += value * count
+
+        # 주요 주제 식별
+        main_topics = [word for word, count in used_keywords.most_common(3)]
+
+        # 문장 복잡성 (간단한 측정)
+        sentence_count = len(_SENTENCE_RE.findall(message))
+        complexity = len(message.split()) / max(sentence_count, 1)
+
+        return {
+            'score': score,
+            'used_keywords': dict(used_keywords),
+            'emotions': dict(emotions),
+            'emotion_score': total_emotion_score,
+            'main_topics': main_topics,
+            'length': len(message),
+            'complexity': complexity,
+            'dominant_emotion': emotions.most_common(1)[0][0] if emotions else None
+        }
+
+    def find_branches(self, message):
+        # 메시지에 분기 단어가 나온 스토리 분기 이름 (analyze 결과에는 넣지 않음)
+        _, _, branch_hits = self.scan(message)
+        return {name for (name, _), hit in zip(self.branches, branch_hits) if hit}
+
+    def analyze_batch(self, messages):
+        # 여러 메시지를 한 번에 분석해 NumPy 배열로 반환 (오프라인 재채점용)
+        messages = list(messages)
+        count = len(messages)
+        keyword_counts = np.zeros((count, len(self.keywords)), dtype=np.int32)
+        emotion_counts = np.zeros((count, len(self.emotions)), dtype=np.int32)
+        lengths = np.zeros(count, dtype=np.int64)
+        word_counts = np.zeros(count, dtype=np.int64)
+        sentence_counts = np.zeros(count, dtype=np.int64)
+
+        for row, message in enumerate(messages):
+            keyword_counts[row], emotion_counts[row], _ = self.scan(message)
+            lengths[row] = len(message)
+            word_counts[row] = len(message.split())
+            sentence_counts[row] = len(_SENTENCE_RE.findall(message))
+
+        keyword_weights = np.array([value for _, value in self.keywords], dtype=np.int64)
+        emotion_values = np.array([value for _, value in self.emotions], dtype=np.int64)
+
+        return {
+            'score': keyword_counts @ keyword_weights,
+            'emotion_score': emotion_counts @ emotion_values,
+            'length': lengths,
+            'complexity': word_counts / np.maximum(sentence_counts, 1),
+            'keyword_counts': keyword_counts,
+            'emotion_counts': emotion_counts,
+        }
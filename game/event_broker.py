@@ -0,0 +1,157 @@
+# game/event_broker.py
+import asyncio
+import itertools
+import logging
+import threading
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .db_router import shard_cache_prefix
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVENT_SETTINGS = {
+    'BACKEND': 'game.event_broker.LocalBroker',  # 다른 노드와 공유하려면 같은 인터페이스의 백엔드로 교체
+    'HISTORY': 50,  # 세션별로 보관하는 최근 이벤트 수 (재접속/long-poll 따라잡기용)
+    'HISTORY_TOPICS': 1000,  # 기록을 보관하는 세션 수 (넘치면 가장 오래 발행이 없던 세션의 기록부터 버림)
+    'QUEUE_SIZE': 100,  # 구독자별 대기 이벤트 한도 (넘치면 가장 오래된 것부터 버림)
+    'LONG_POLL_TIMEOUT': 25,  # long-poll 요청이 새 이벤트를 기다리는 최대 시간(초)
+}
+
+
+def get_event_settings():
+    return {**DEFAULT_EVENT_SETTINGS, **getattr(settings, 'GAME_EVENTS', {})}
+
+
+def _topic(game_session_id):
+    return f'game-session:{shard_cache_prefix()}{game_session_id}'
+
+
+class Subscription:
+    # 구독자 하나 = 이벤트 루프에 묶인 asyncio.Queue 하나 (스레드/태스크를 따로 두지 않음)
+
+    def __init__(self, broker, topic, queue_size):
+        self.broker = broker
+        self.topic = topic
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def deliver(self, event):
+        # 이벤트 루프 스레드에서만 호출됨
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """
+    프로세스 안에서만 동작하는 팬아웃 브로커.
+    publish는 어느 스레드에서든 호출할 수 있고, 각 구독자의 이벤트 루프로 call_soon_threadsafe를 통해 전달됨.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._history = OrderedDict()
+        self._sequence = itertools.count(1)
+
+    def publish(self, topic, event_type, data):
+        with self._lock:
+            event = {'seq': next(self._sequence), 'type': event_type, 'data': data}
+            history = self._history.get(topic)
+            if history is None:
+                history = self._history[topic] = deque(maxlen=self.options['HISTORY'])
+                if len(self._history) > self.options['HISTORY_TOPICS']:
+                    self._history.popitem(last=False)
+            else:
+                self._history.move_to_end(topic)
+            history.append(event)
+            subscribers = list(self._subscribers.get(topic, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # 이미 닫힌 이벤트 루프의 구독자
+                self.unsubscribe(subscription)
+        return event
+
+    def recent(self, topic, after=0):
+        with self._lock:
+            return [event for event in self._history.get(topic, ()) if event['seq'] > after]
+
+    def subscribe(self, topic):
+        # 실행 중인 이벤트 루프 안에서 호출해야 함
+        subscription = Subscription(self, topic, self.options['QUEUE_SIZE'])
+        with self._lock:
+            self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.topic]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                options = get_event_settings()
+                _broker = import_string(options['BACKEND'])(options)
+    return _broker
+
+
+def publish_game_event(game_session_id, event_type, data):
+    try:
+        return get_broker().publish(_topic(game_session_id), event_type, data)
+    except Exception as e:
+        # 알림 실패가 턴 처리에 영향을 주지 않도록 기록만 함
+        logger.error(f"게임 이벤트 전송 실패. 게임 세션 {game_session_id}: {e}")
+        return None
+
+
+def recent_game_events(game_session_id, after=0):
+    return get_broker().recent(_topic(game_session_id), after)
+
+
+def subscribe_game_events(game_session_id):
+    return get_broker().subscribe(_topic(game_session_id))
+
+
+def publish_turn_events(game_session_id, turn, previous_state, state, game_end=None):
+    """
+    턴이 커밋된 뒤 호출: 턴 결과, 바뀐 상태 값, (끝났다면) 게임 종료 이벤트를 순서대로 발행.
+    """
+    publish_game_event(game_session_id, 'turn', turn)
+    delta = {key: value for key, value in state.items() if previous_state.get(key) != value}
+    if delta:
+        publish_game_event(game_session_id, 'state', delta)
+    if game_end:
+        publish_game_event(game_session_id, 'game_end', game_end)
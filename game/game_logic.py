@@ -1,11 +1,34 @@
 # game/game_logic.py
 import logging
 
+from django.db.models import F
+from django.db.models.functions import Greatest, Least
 from django.utils import timezone
-from .models import GameSession, GameState, StoryProgress, Dialogue
+from .models import GameSession, GameState, StoryProgress, Dialogue, PlotEvent
 from .chatbot import analyze_player_message, generate_demon_lord_response
+from .conversation_memory import commit_summary_update
+from .db_router import game_db
+from .db_utils import update_returning
+from .lexicon import get_lexicon
 
 logger = logging.getLogger(__name__)
+
+APPROACH_BONUS = {
+    '논리적': 10,
+    '감정적': 5,
+    '단호한': 0,
+    '공감적': 15
+}
+
+
+class StaleGameStateError(Exception):
+    """턴을 처리하는 사이 다른 요청이 GameState를 먼저 변경한 경우"""
+
+
+class GameSessionClosedError(Exception):
+    """턴을 처리하는 사이 게임 세션이 종료된 경우 (예: 제한 시간 만료 처리)"""
+
+
 def update_emotional_state(current_state, emotional_impact):
     # 입력값을 float로 변환 시도
     try:
@@ -47,29 +70,123 @@ def calculate_argument_strength(persuasion_level, resistance, approach):
     base_strength = persuasion_level - resistance
 
     # 접근 방식에 따른 보정
-    approach_bonus = {
-        '논리적': 10,
-        '감정적': 5,
-        '단호한': 0,
-        '공감적': 15
+    return max(base_strength + APPROACH_BONUS.get(approach, 0), 0)
+
+
+def apply_game_state_turn(game_state, persuasion_increase, player_analysis=None):
+    """
+    턴의 변화량을 F() 표현식으로 만들어 조건부 UPDATE ... RETURNING 한 번으로 반영.
+    0~100 제한과 논점 강도 계산도 DB에서 처리하고, 바뀐 필드만 기록함.
+    읽어 온 시점 이후 다른 턴이 먼저 저장됐다면 (version 불일치) StaleGameStateError.
+    """
+    # recent_messages는 응답 생성 시 remember_turn이 이미 갱신해 둠
+    changes = {'recent_messages': game_state.recent_messages}
+    persuasion = F('player_persuasion_level')
+    resistance = F('demon_lord_resistance')
+    if persuasion_increase:
+        persuasion = Least(persuasion + persuasion_increase, 100)
+        resistance = Greatest(resistance - persuasion_increase, 0)
+        changes['player_persuasion_level'] = persuasion
+        changes['demon_lord_resistance'] = resistance
+
+    # LLM이 응답과 함께 돌려준 플레이어 메시지 분석 반영 (calculate_argument_strength와 같은 식)
+    if player_analysis:
+        changes['player_emotional_state'] = player_analysis['emotional_impact']
+        changes['argument_strength'] = Greatest(
+            persuasion - resistance + APPROACH_BONUS.get(player_analysis['primary_approach'], 0), 0
+        )
+
+    rows = update_returning(
+        GameState.objects.filter(pk=game_state.pk, version=game_state.version),
+        ('player_persuasion_level', 'demon_lord_resistance', 'argument_strength', 'version'),
+        version=F('version') + 1,
+        **changes
+    )
+    if not rows:
+        raise StaleGameStateError(f"GameState {game_state.pk} was modified concurrently")
+    # 저장된 recent_messages에서 밀려난 턴은 이 턴이 커밋된 뒤에만 요약에 반영
+    commit_summary_update(game_state, game_db())
+
+    if player_analysis:
+        game_state.player_emotional_state = player_analysis['emotional_impact']
+    for field, value in rows[0].items():
+        setattr(game_state, field, value)
+    return game_state
+
+
+def apply_story_progress_turn(story_progress, progress_increase, new_plot_point=None, story_path=None):
+    """
+    챕터/진행도/턴 수는 DB에서 증가시켜 UPDATE ... RETURNING 한 번으로 반영.
+    새 플롯 포인트는 PlotEvent INSERT 한 번으로 추가하고, 종료 조건에 쓰는 값(마지막 이벤트, 종료 플래그)과
+    스토리 분기만 StoryProgress 컬럼에 함께 기록.
+    """
+    changes = {
+        'current_chapter': F('current_chapter') + 1,
+        'progress': F('progress') + progress_increase,
+        'turn_count': F('turn_count') + 1,
     }
-
-    return max(base_strength + approach_bonus.get(approach, 0), 0)
-
-
-def update_game_state(game_session, player_message, demon_lord_response, dialogue_analysis):
+    if new_plot_point:
+        PlotEvent.objects.create(
+            game_session_id=story_progress.game_session_id,
+            event_type=new_plot_point['type'],
+            chapter=new_plot_point['chapter'],
+            description=new_plot_point.get('description', ''),
+            impact=new_plot_point.get('impact', {}),
+        )
+        changes['last_event_type'] = new_plot_point['type']
+        if new_plot_point['type'] == PlotEvent.GAME_OVER:
+            changes['game_over'] = True
+    if story_path:
+        changes['story_path'] = story_path
+
+    rows = update_returning(
+        StoryProgress.objects.filter(pk=story_progress.pk),
+        ('current_chapter', 'progress', 'turn_count'),
+        **changes
+    )
+    for field, value in (rows[0].items() if rows else ()):
+        setattr(story_progress, field, value)
+    for field in ('last_event_type', 'game_over', 'story_path'):
+        if field in changes:
+            setattr(story_progress, field, changes[field])
+    return story_progress
+
+
+class TurnUnitOfWork:
+    """
+    한 턴에서 생기는 쓰기를 모아 flush()에서 최소한의 쿼리로 반영 (호출하는 쪽의 트랜잭션 안에서 사용).
+    대화 두 줄은 bulk_create 한 번, GameState/StoryProgress는 각각 UPDATE ... RETURNING 한 번.
+    턴 수는 StoryProgress.turn_count로 함께 증가하므로 Dialogue 테이블을 세지 않음.
+    """
+
+    def __init__(self, game_session):
+        self.game_session = game_session
+        self.dialogues = []
+
+    def add_dialogue(self, speaker, content):
+        self.dialogues.append(Dialogue(game_session=self.game_session, speaker=speaker, content=content))
+
+    def flush(self, player_message, demon_lord_response, dialogue_analysis, player_analysis=None):
+        if self.dialogues:
+            Dialogue.objects.bulk_create(self.dialogues)
+            self.dialogues = []
+        return update_game_state(
+            self.game_session,
+            player_message,
+            demon_lord_response,
+            dialogue_analysis,
+            player_analysis
+        )
+
+
+def update_game_state(game_session, player_message, demon_lord_response, dialogue_analysis, player_analysis=None):
     game_state = game_session.gamestate
     story_progress = game_session.storyprogress
 
-    # 플레이어의 설득력 업
-    print("dialogue_analysis['score']", dialogue_analysis)
+    # 플레이어의 설득력 업 / 마왕의 저항력 감소: 대화 점수만큼 (계산과 저장은 DB에서 한 번에)
     persuasion_increase = dialogue_analysis['score']  # 대화 점수를 기반으로 설득력 증가
-    game_state.player_persuasion_level = min(100, game_state.player_persuasion_level + persuasion_increase)
-    print('game_state.player_persuasion_level', game_state.player_persuasion_level)
-
-    # 마왕의 저항력 업데이트
-    resistance_decrease = persuasion_increase # 설득력 증가에 따라 저항력 감소
-    game_state.demon_lord_resistance = max(0, game_state.demon_lord_resistance - resistance_decrease)
+    apply_game_state_turn(game_state, persuasion_increase, player_analysis)
+    logger.debug("설득력 %s (+%s)", game_state.player_persuasion_level, persuasion_increase)
 
     # 감정 상태 업데이트
     # game_state.player_emotional_state = (
@@ -86,16 +203,13 @@ def update_game_state(game_session, player_message, demon_lord_response, dialogu
     # 현재 턴(챕터) 업데이트
     # story_progress.current_chapter += 1
 
-    story_progress_result = update_story_progress(story_progress, game_state, dialogue_analysis, demon_lord_response)
+    story_progress_result = update_story_progress(
+        story_progress, game_state, dialogue_analysis, demon_lord_response, player_message)
 
     # 게임 종료 조건 확인
     is_game_ended = story_progress_result['is_completed']
     game_result = story_progress_result['result']
 
-    # 변경사항 저장
-    game_state.save()
-    story_progress.save()
-
     return {
         "current_chapter": story_progress.current_chapter,
         "player_persuasion_level": round(game_state.player_persuasion_level, 2),
@@ -108,7 +222,7 @@ def update_game_state(game_session, player_message, demon_lord_response, dialogu
         "story_path": story_progress_result.get('story_path'),
     }
 
-def update_story_progress(story_progress, game_state, dialogue_analysis, demon_lord_response):
+def update_story_progress(story_progress, game_state, dialogue_analysis, demon_lord_response, player_message=''):
     logger.info(f"Updating story progress. Current chapter: {story_progress.current_chapter}, "
                 f"Player persuasion: {game_state.player_persuasion_level}, "
                 f"Demon lord resistance: {game_state.demon_lord_resistance}")
@@ -117,28 +231,24 @@ def update_story_progress(story_progress, game_state, dialogue_analysis, demon_l
     is_completed = False
     result = None
 
-    # 턴 증가
-    story_progress.current_chapter += 1
-    current_turn = story_progress.current_chapter
-
-    logger.info(f"Turn increased. New turn: {current_turn}")
+    # 턴 증가 (저장은 아래 apply_story_progress_turn에서 한 번에)
+    next_chapter = story_progress.current_chapter + 1
 
     # 플레이어의 설득력에 따른 진행도 증가
     progress_increase = game_state.player_persuasion_level
-    story_progress.progress += progress_increase
-    logger.info(f"Progress increased. New progress: {story_progress.progress}")
 
     # 마왕의 응답에 대한 간단한 감정 분석
     sentiment = "negative" if any(word in demon_lord_response for word in ["분노", "거부", "저항"]) else "neutral"
     if "동의" in demon_lord_response or "이해" in demon_lord_response:
         sentiment = "positive"
 
-    # 플롯 포인트 추가 및 관리
+    # 플롯 포인트 추가 및 관리 (분기 키워드는 점수 사전의 story_branches)
+    branches = get_lexicon().branches(player_message)
     new_plot_point = None
-    if "평화" in dialogue_analysis['used_keywords'] or "협력" in dialogue_analysis['used_keywords']:
+    if 'peace_proposal' in branches:
         new_plot_point = {
             "type": "peace_proposal",
-            "chapter": story_progress.current_chapter,
+            "chapter": next_chapter,
             "description": "플레이어가 평화적 해결책 제안",
             "impact": {
                 "player_persuasion": game_state.player_persuasion_level,
@@ -148,7 +258,7 @@ def update_story_progress(story_progress, game_state, dialogue_analysis, demon_l
     elif dialogue_analysis['score'] > 50:  # 높은 대화 점수
         new_plot_point = {
             "type": "successful_argument",
-            "chapter": story_progress.current_chapter,
+            "chapter": next_chapter,
             "description": "플레이어가 강력한 논점 제시",
             "impact": {
                 "persuasion_increase": progress_increase
@@ -157,7 +267,7 @@ def update_story_progress(story_progress, game_state, dialogue_analysis, demon_l
     elif game_state.demon_lord_resistance < 50 and game_state.demon_lord_resistance >= 40:
         new_plot_point = {
             "type": "demon_lord_wavering",
-            "chapter": story_progress.current_chapter,
+            "chapter": next_chapter,
             "description": "마왕의 결심이 흔들리기 시작함",
             "impact": {
                 "resistance_decrease": 50 - game_state.demon_lord_resistance
@@ -166,7 +276,7 @@ def update_story_progress(story_progress, game_state, dialogue_analysis, demon_l
     elif sentiment == 'negative':
         new_plot_point = {
             "type": "demon_lord_resistance",
-            "chapter": story_progress.current_chapter,
+            "chapter": next_chapter,
             "description": "마왕이 강하게 저항함",
             "impact": {
                 "resistance_increase": 5
@@ -175,19 +285,28 @@ def update_story_progress(story_progress, game_state, dialogue_analysis, demon_l
     elif sentiment == 'positive':
         new_plot_point = {
             "type": "demon_lord_consideration",
-            "chapter": story_progress.current_chapter,
+            "chapter": next_chapter,
             "description": "마왕이 플레이어의 제안을 고려 중",
             "impact": {
                 "resistance_decrease": 5
             }
         }
 
-    if new_plot_point:
-        if not isinstance(story_progress.plot_points, list):
-            story_progress.plot_points = []
-        story_progress.plot_points.append(new_plot_point)
+    # 스토리 분기 처리
+    story_path = None
+    if next_chapter == 3:
+        if 'alliance' in branches and sentiment == 'positive':
+            story_path = "alliance"
+        elif 'confrontation' in branches or sentiment == 'negative':
+            story_path = "confrontation"
+        else:
+            story_path = "neutral"
+
+    apply_story_progress_turn(story_progress, progress_increase, new_plot_point, story_path)
+    current_turn = story_progress.current_chapter
+    logger.info(f"Turn increased. New turn: {current_turn}, progress: {story_progress.progress}")
 
-        # 게임 종료 조건 확인
+    # 게임 종료 조건 확인
     if current_turn > MAX_TURNS:
         is_completed = True
         result = "victory" if game_state.player_persuasion_level > game_state.demon_lord_resistance else "defeat"
@@ -201,24 +320,13 @@ def update_story_progress(story_progress, game_state, dialogue_analysis, demon_l
         result = "surrender"
         logger.info("Game ended due to demon lord's resistance reaching zero")
 
-    # 스토리 분기 처리
-    if story_progress.current_chapter == 3:
-        if "동맹" in dialogue_analysis['used_keywords'] and sentiment == 'positive':
-            story_progress.story_path = "alliance"
-        elif "대결" in dialogue_analysis['used_keywords'] or sentiment == 'negative':
-            story_progress.story_path = "confrontation"
-        else:
-            story_progress.story_path = "neutral"
-
-    story_progress.save()
-
     logger.info(f"Story progress update completed. Is game completed: {is_completed}, Result: {result}")
 
     return {
         "current_chapter": story_progress.current_chapter,
         "progress": story_progress.progress,
-        "plot_points": story_progress.plot_points,
-        "story_path": getattr(story_progress, 'story_path', None),
+        "new_plot_point": new_plot_point,
+        "story_path": story_progress.story_path or None,
         "is_completed": is_completed,
         "result": result
     }
@@ -0,0 +1,103 @@
+# game/lexicon.py
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from .dialogue_analyzer import DialogueAnalyzer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEXICON_PATH = Path(__file__).resolve().parent / 'data' / 'lexicon.json'
+DEFAULT_RELOAD_INTERVAL = 5.0
+
+
+class CompiledLexicon:
+    # 로드 시점에 한 번 컴파일되는 불변 색인. 교체는 LexiconStore가 참조를 바꾸는 방식으로만 이루어짐
+    __slots__ = ('version', 'keywords', 'analyzer')
+
+    def __init__(self, data):
+        emotion_patterns = {
+            item['pattern']: (item['emotion'], item['value'])
+            for item in data.get('emotion_patterns', [])
+        }
+        self.version = data.get('version')
+        self.keywords = tuple(data.get('keywords', {}))
+        self.analyzer = DialogueAnalyzer(
+            data.get('keywords', {}), emotion_patterns, data.get('story_branches', {}))
+
+    def analyze(self, message):
+        return self.analyzer.analyze(message)
+
+    def analyze_batch(self, messages):
+        return self.analyzer.analyze_batch(messages)
+
+    def branches(self, message):
+        # 메시지에 나온 스토리 분기 (점수 키워드가 아닌 '동맹', '대결' 등도 같은 오토마톤으로 찾음)
+        return self.analyzer.find_branches(message)
+
+
+class LexiconStore:
+    def __init__(self, path, reload_interval):
+        self.path = Path(path)
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._current = None
+        self._mtime = None
+        self._checked_at = 0.0
+
+    def _load(self):
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, encoding='utf-8') as f:
+            lexicon = CompiledLexicon(json.load(f))
+        return lexicon, mtime
+
+    def _refresh(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._current is not None and now - self._checked_at < self.reload_interval:
+                return
+            self._checked_at = now
+            try:
+                if self._current is not None and os.stat(self.path).st_mtime == self._mtime:
+                    return
+                lexicon, mtime = self._load()
+            except Exception as e:
+                if self._current is None:
+                    raise
+                # 잘못된 파일이 올라와도 기존 사전을 계속 사용
+                logger.error(f"점수 사전 다시 불러오기 실패, 기존 버전 {self._current.version} 유지: {e}")
+                return
+            if self._current is not None:
+                logger.info(f"점수 사전 교체: 버전 {self._current.version} -> {lexicon.version}")
+            self._current, self._mtime = lexicon, mtime
+
+    def get(self):
+        # 파일 변경 확인은 reload_interval마다 한 번만 (요청마다 stat/컴파일하지 않음)
+        if self._current is None or time.monotonic() - self._checked_at >= self.reload_interval:
+            self._refresh()
+        return self._current
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_lexicon_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = LexiconStore(
+                    getattr(settings, 'GAME_LEXICON_PATH', DEFAULT_LEXICON_PATH),
+                    getattr(settings, 'GAME_LEXICON_RELOAD_INTERVAL', DEFAULT_RELOAD_INTERVAL),
+                )
+    return _store
+
+
+def get_lexicon():
+    return get_lexicon_store().get()
@@ -0,0 +1,570 @@
+# game/llm_transport.py
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import httpx
+import openai
+from openai import OpenAI, AsyncOpenAI
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRANSPORT_SETTINGS = {
+    'MAX_CONCURRENCY': 32,
+    'MAX_QUEUE': 200,
+    'QUEUE_TIMEOUT': 5.0,
+    'MAX_RETRIES': 3,
+    'BACKOFF_BASE': 0.5,
+    'BACKOFF_MAX': 8.0,
+    'CONNECT_TIMEOUT': 5.0,
+    'READ_TIMEOUT': 30.0,
+    'MAX_CONNECTIONS': 64,
+    'MAX_KEEPALIVE_CONNECTIONS': 32,
+    'KEEPALIVE_EXPIRY': 30.0,
+    'TURN_DEADLINE': 12.0,
+    'HEDGE_AFTER': 4.0,
+    'BREAKER_FAILURE_THRESHOLD': 5,
+    'BREAKER_RECOVERY_TIMEOUT': 30.0,
+    'BREAKER_HALF_OPEN_MAX_CALLS': 1,
+}
+
+# 재시도해도 되는 오류 (레이트 리밋, 연결 문제, 타임아웃, 5xx)
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+def _is_provider_failure(error):
+    # 차단기에 반영할 공급자 장애: 타임아웃/연결 오류, 레이트 리밋, 5xx
+    # 400/401/422 등 요청 자체의 문제는 다른 플레이어의 호출까지 막지 않도록 제외
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, httpx.TransportError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+class LLMOverloadedError(Exception):
+    """동시 실행 한도와 대기열이 모두 찼거나 대기 시간이 초과된 경우"""
+
+
+class LLMDeadlineExceeded(Exception):
+    """턴 지연 예산(TURN_DEADLINE) 안에 응답을 받지 못한 경우"""
+
+
+class LLMCircuitOpenError(Exception):
+    """연속 실패로 회로 차단기가 열려 공급자 호출을 건너뛰는 경우"""
+
+
+class TransportMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.rejected = 0
+        self.queue_timeouts = 0
+        self.retries = 0
+        self.failures = 0
+        self.client_errors = 0
+        self.hedges = 0
+        self.deadline_exceeded = 0
+        self.short_circuited = 0
+        self.queue_time_count = 0
+        self.queue_time_total = 0.0
+        self.queue_time_max = 0.0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def record_queue_time(self, seconds):
+        with self._lock:
+            self.queue_time_count += 1
+            self.queue_time_total += seconds
+            self.queue_time_max = max(self.queue_time_max, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'rejected': self.rejected,
+                'queue_timeouts': self.queue_timeouts,
+                'retries': self.retries,
+                'failures': self.failures,
+                'client_errors': self.client_errors,
+                'hedges': self.hedges,
+                'deadline_exceeded': self.deadline_exceeded,
+                'short_circuited': self.short_circuited,
+                'queue_time_avg': self.queue_time_total / self.queue_time_count if self.queue_time_count else 0.0,
+                'queue_time_max': self.queue_time_max,
+            }
+
+
+class _Waiter:
+    __slots__ = ('granted', 'event', 'loop', 'future')
+
+    def __init__(self, event=None, loop=None, future=None):
+        self.granted = False
+        self.event = event
+        self.loop = loop
+        self.future = future
+
+    def wake(self):
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve_future, self.future)
+
+
+def _resolve_future(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class ConcurrencyLimiter:
+    # 스레드(WSGI)와 이벤트 루프(ASGI) 양쪽에서 함께 쓰는 프로세스 전역 세마포어 + 제한된 대기열
+
+    def __init__(self, max_concurrency, max_queue, metrics):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters = deque()
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def _acquire_or_enqueue(self, waiter):
+        with self._lock:
+            if self._in_flight < self.max_concurrency and not self._waiters:
+                self._in_flight += 1
+                return True
+            if len(self._waiters) >= self.max_queue:
+                self.metrics.incr('rejected')
+                raise LLMOverloadedError("LLM request queue is full")
+            self._waiters.append(waiter)
+            return False
+
+    def try_acquire(self):
+        # 대기 없이 빈 슬롯이 있을 때만 획득 (헤지 요청용)
+        with self._lock:
+            if self._in_flight < self.max_concurrency and not self._waiters:
+                self._in_flight += 1
+                return True
+            return False
+
+    def _abandon(self, waiter):
+        # 대기를 포기함. 이미 슬롯을 넘겨받았다면 True (호출자가 슬롯을 소유)
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def acquire(self, timeout):
+        started = time.monotonic()
+        waiter = _Waiter(event=threading.Event())
+        if not self._acquire_or_enqueue(waiter):
+            if not waiter.event.wait(timeout) and not self._abandon(waiter):
+                self.metrics.incr('queue_timeouts')
+                raise LLMOverloadedError("Timed out waiting for an LLM request slot")
+        self.metrics.record_queue_time(time.monotonic() - started)
+
+    async def aacquire(self, timeout):
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(loop=loop, future=loop.create_future())
+        if not self._acquire_or_enqueue(waiter):
+            try:
+                await asyncio.wait_for(waiter.future, timeout)
+            except asyncio.TimeoutError:
+                if not self._abandon(waiter):
+                    self.metrics.incr('queue_timeouts')
+                    raise LLMOverloadedError("Timed out waiting for an LLM request slot")
+            except asyncio.CancelledError:
+                if self._abandon(waiter):
+                    self.release()
+                raise
+        self.metrics.record_queue_time(time.monotonic() - started)
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                # 슬롯을 반납하지 않고 다음 대기자에게 그대로 넘김
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                try:
+                    waiter.wake()
+                except RuntimeError:
+                    # 이미 닫힌 이벤트 루프의 대기자: 그다음 대기자에게 넘기거나 슬롯을 반납
+                    continue
+                return
+            self._in_flight -= 1
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, recovery_timeout, half_open_max_calls, metrics):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+
+    @property
+    def state(self):
+        return self._state
+
+    def before_call(self):
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    self.metrics.incr('short_circuited')
+                    raise LLMCircuitOpenError("LLM provider circuit is open")
+                # 복구 대기 시간이 지나면 소수의 탐색 요청만 통과시킴
+                self._state = self.HALF_OPEN
+                self._half_open_calls = 0
+            if self._state == self.HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    self.metrics.incr('short_circuited')
+                    raise LLMCircuitOpenError("LLM provider circuit is half-open, probe in progress")
+                self._half_open_calls += 1
+
+    def cancel_probe(self):
+        # 탐색 요청의 결과를 알 수 없이 끝난 경우 (로컬 대기열 거절, 요청 오류, 클라이언트 연결 끊김으로 인한 취소)
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("LLM 회로 차단기 닫힘 (공급자 복구)")
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"LLM 회로 차단기 열림 (연속 실패 {self._failures}회)")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+def _retry_after_seconds(error):
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if 'retry-after-ms' in headers:
+            return float(headers['retry-after-ms']) / 1000
+        if 'retry-after' in headers:
+            return float(headers['retry-after'])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+class LLMTransport:
+    def __init__(self, **options):
+        self.options = {**DEFAULT_TRANSPORT_SETTINGS, **options}
+        self.metrics = TransportMetrics()
+        self.limiter = ConcurrencyLimiter(
+            self.options['MAX_CONCURRENCY'],
+            self.options['MAX_QUEUE'],
+            self.metrics,
+        )
+        self.breaker = CircuitBreaker(
+            self.options['BREAKER_FAILURE_THRESHOLD'],
+            self.options['BREAKER_RECOVERY_TIMEOUT'],
+            self.options['BREAKER_HALF_OPEN_MAX_CALLS'],
+            self.metrics,
+        )
+        # 헤지 요청을 동시에 기다리기 위한 스레드 풀 (동시 실행 수는 limiter가 제한)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.options['MAX_CONCURRENCY'],
+            thread_name_prefix='llm-transport',
+        )
+        self._client = None
+        self._client_lock = threading.Lock()
+        # httpx.AsyncClient의 연결 풀은 이벤트 루프에 묶여 있으므로 루프마다 하나씩 생성
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def _http_options(self):
+        return {
+            'limits': httpx.Limits(
+                max_connections=self.options['MAX_CONNECTIONS'],
+                max_keepalive_connections=self.options['MAX_KEEPALIVE_CONNECTIONS'],
+                keepalive_expiry=self.options['KEEPALIVE_EXPIRY'],
+            ),
+            'timeout': httpx.Timeout(
+                self.options['READ_TIMEOUT'],
+                connect=self.options['CONNECT_TIMEOUT'],
+            ),
+        }
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    # 재시도는 LLMTransport가 직접 처리하므로 SDK 재시도는 끔
+                    self._client = OpenAI(http_client=httpx.Client(**self._http_options()), max_retries=0)
+        return self._client
+
+    @property
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = AsyncOpenAI(http_client=httpx.AsyncClient(**self._http_options()), max_retries=0)
+            self._async_clients[loop] = client
+        return client
+
+    def _retry_delay(self, attempt, error):
+        # 지수 백오프 + full jitter, 서버가 Retry-After를 주면 그 이상 기다림
+        backoff = min(self.options['BACKOFF_MAX'], self.options['BACKOFF_BASE'] * (2 ** attempt))
+        delay = random.uniform(0, backoff)
+        retry_after = _retry_after_seconds(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.options['BACKOFF_MAX']))
+        return delay
+
+    def _should_retry(self, attempt, error):
+        if isinstance(error, RETRYABLE_ERRORS) and attempt < self.options['MAX_RETRIES']:
+            self.metrics.incr('retries')
+            logger.warning(f"LLM 요청 실패, 재시도 {attempt + 1}/{self.options['MAX_RETRIES']}: {error}")
+            return True
+        return False
+
+    def _deadline(self):
+        return time.monotonic() + self.options['TURN_DEADLINE']
+
+    @staticmethod
+    def _remaining(deadline_at):
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise LLMDeadlineExceeded("LLM turn deadline exceeded")
+        return remaining
+
+    def _queue_timeout(self, deadline_at):
+        return min(self.options['QUEUE_TIMEOUT'], self._remaining(deadline_at))
+
+    def _record_outcome(self, error):
+        # 로컬 과부하(대기열 거절)는 공급자 장애가 아니므로 차단기에 반영하지 않음
+        if error is None:
+            self.breaker.record_success()
+        elif isinstance(error, LLMDeadlineExceeded):
+            self.metrics.incr('deadline_exceeded')
+            self.breaker.record_failure()
+        elif isinstance(error, LLMOverloadedError):
+            self.breaker.cancel_probe()
+        elif _is_provider_failure(error):
+            self.metrics.incr('failures')
+            self.breaker.record_failure()
+        else:
+            self.metrics.incr('client_errors')
+            self.breaker.cancel_probe()
+
+    def _create(self, kwargs, deadline_at):
+        attempt = 0
+        while True:
+            try:
+                return self.client.chat.completions.create(timeout=self._remaining(deadline_at), **kwargs)
+            except Exception as e:
+                if not self._should_retry(attempt, e):
+                    raise
+                delay = self._retry_delay(attempt, e)
+                if time.monotonic() + delay >= deadline_at:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+
+    def _attempt(self, kwargs, deadline_at):
+        # 슬롯은 호출자가 미리 획득한 상태로 들어옴
+        try:
+            return self._create(kwargs, deadline_at)
+        finally:
+            self.limiter.release()
+
+    def _hedged_call(self, kwargs, deadline_at):
+        self.limiter.acquire(self._queue_timeout(deadline_at))
+        hedge_after = self.options['HEDGE_AFTER']
+        if hedge_after is None:
+            return self._attempt(kwargs, deadline_at)
+
+        pending = {self._executor.submit(self._attempt, kwargs, deadline_at)}
+        done, _ = wait(pending, timeout=min(hedge_after, self._remaining(deadline_at)))
+        if not done and self.limiter.try_acquire():
+            # 첫 요청이 늦어지면 같은 요청을 하나 더 보내고 먼저 끝난 쪽을 사용
+            self.metrics.incr('hedges')
+            pending.add(self._executor.submit(self._attempt, kwargs, deadline_at))
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=self._remaining(deadline_at), return_when=FIRST_COMPLETED)
+            if not done:
+                raise LLMDeadlineExceeded("LLM turn deadline exceeded")
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def chat_completion(self, **kwargs):
+        self.metrics.incr('requests')
+        self.breaker.before_call()
+        try:
+            response = self._hedged_call(kwargs, self._deadline())
+        except Exception as e:
+            self._record_outcome(e)
+            raise
+        except BaseException:
+            self.breaker.cancel_probe()
+            raise
+        self._record_outcome(None)
+        return response
+
+    async def _acreate(self, kwargs, deadline_at):
+        attempt = 0
+        while True:
+            try:
+                return await self.async_client.chat.completions.create(
+                    timeout=self._remaining(deadline_at), **kwargs
+                )
+            except Exception as e:
+                if not self._should_retry(attempt, e):
+                    raise
+                delay = self._retry_delay(attempt, e)
+                if time.monotonic() + delay >= deadline_at:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _aattempt(self, kwargs, deadline_at):
+        try:
+            return await self._acreate(kwargs, deadline_at)
+        finally:
+            self.limiter.release()
+
+    async def _ahedged_call(self, kwargs, deadline_at):
+        await self.limiter.aacquire(self._queue_timeout(deadline_at))
+        tasks = {asyncio.ensure_future(self._aattempt(kwargs, deadline_at))}
+        try:
+            hedge_after = self.options['HEDGE_AFTER']
+            if hedge_after is not None:
+                done, _ = await asyncio.wait(tasks, timeout=min(hedge_after, self._remaining(deadline_at)))
+                if not done and self.limiter.try_acquire():
+                    self.metrics.incr('hedges')
+                    tasks.add(asyncio.ensure_future(self._aattempt(kwargs, deadline_at)))
+
+            error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=self._remaining(deadline_at), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise LLMDeadlineExceeded("LLM turn deadline exceeded")
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # 늦게 끝나는 쪽은 취소 (슬롯은 _aattempt의 finally에서 반납)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def achat_completion(self, **kwargs):
+        self.metrics.incr('requests')
+        self.breaker.before_call()
+        try:
+            response = await self._ahedged_call(kwargs, self._deadline())
+        except Exception as e:
+            self._record_outcome(e)
+            raise
+        except BaseException:
+            # CancelledError (SSE 클라이언트 연결 끊김, ASGI 취소)는 Exception이 아니므로 따로 탐색 슬롯을 돌려줌
+            self.breaker.cancel_probe()
+            raise
+        self._record_outcome(None)
+        return response
+
+    async def astream_chat_completion(self, **kwargs):
+        # 스트림을 다 읽을 때까지 슬롯을 점유. 재시도와 데드라인은 스트림을 열 때까지만 적용
+        self.metrics.incr('requests')
+        self.breaker.before_call()
+        deadline_at = self._deadline()
+        try:
+            await self.limiter.aacquire(self._queue_timeout(deadline_at))
+        except Exception as e:
+            self._record_outcome(e)
+            raise
+        except BaseException:
+            self.breaker.cancel_probe()
+            raise
+        try:
+            try:
+                stream = await asyncio.wait_for(
+                    self._acreate(dict(kwargs, stream=True), deadline_at),
+                    self._remaining(deadline_at),
+                )
+            except asyncio.TimeoutError:
+                error = LLMDeadlineExceeded("LLM turn deadline exceeded")
+                self._record_outcome(error)
+                raise error
+            except Exception as e:
+                self._record_outcome(e)
+                raise
+            except BaseException:
+                self.breaker.cancel_probe()
+                raise
+            self._record_outcome(None)
+            async for chunk in stream:
+                yield chunk
+        finally:
+            self.limiter.release()
+
+    def stats(self):
+        return {
+            **self.metrics.snapshot(),
+            'in_flight': self.limiter.in_flight,
+            'queued': self.limiter.queued,
+            'circuit_state': self.breaker.state,
+        }
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = LLMTransport(**getattr(settings, 'LLM_TRANSPORT', {}))
+    return _transport
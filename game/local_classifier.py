@@ -0,0 +1,157 @@
+# game/local_classifier.py
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CLASSIFIER_SETTINGS = {
+    'MODEL': 'nlptown/bert-base-multilingual-uncased-sentiment',  # 1~5 stars 다국어 감정 모델
+    'MAX_BATCH_SIZE': 32,  # 한 번의 forward pass에 묶을 최대 메시지 수
+    'MAX_WAIT_MS': 10,  # 배치를 모으기 위해 기다리는 최대 시간
+    'WORKERS': 1,  # 배치를 처리할 워커 스레드 수
+}
+
+EMOTION_LABELS = ["매우 부정적", "부정적", "중립적", "긍정적", "매우 긍정적"]
+
+THREAT_MARKERS = ("위협", "공격", "파괴", "죽", "멸망", "복수")
+
+
+def get_classifier_settings():
+    return {**DEFAULT_CLASSIFIER_SETTINGS, **getattr(settings, 'LOCAL_CLASSIFIER', {})}
+
+
+class MicroBatcher:
+    # 동시에 들어온 요청을 짧게 모아 한 번에 처리 (최대 MAX_WAIT_MS 또는 MAX_BATCH_SIZE개)
+
+    def __init__(self, predict_batch, max_batch_size, max_wait, workers):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._workers = [
+            threading.Thread(target=self._run, name=f'local-classifier-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, text):
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self.predict_batch([text for text, _ in batch])
+            except Exception as e:
+                logger.error(f"로컬 분석기 배치 처리 중 오류 발생: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+def _scores_to_analysis(message, scores):
+    # scores: [{'label': '1 star', 'score': ...}, ...] -> 기존 analyze_player_message와 같은 키
+    probabilities = {int(item['label'].split()[0]): item['score'] for item in scores}
+    total = sum(probabilities.values()) or 1.0
+    expected_stars = sum(stars * score for stars, score in probabilities.items()) / total
+
+    emotion_index = max(0, min(len(EMOTION_LABELS) - 1, int(round(expected_stars)) - 1))
+    is_threat = any(marker in message for marker in THREAT_MARKERS)
+
+    return {
+        "persuasion_strength": 0 if is_threat else int(round((expected_stars - 1) / 4 * 10)),
+        "emotional_impact": EMOTION_LABELS[emotion_index],
+        "primary_approach": "위협" if is_threat else "설득",
+    }
+
+
+class LocalMessageClassifier:
+    def __init__(self, options):
+        # transformers/torch는 로컬 분석기를 실제로 쓸 때(첫 get_classifier 호출)만 import
+        try:
+            from transformers import pipeline
+        except ImportError as e:
+            raise ImportError("transformers is required for the local classifier backend") from e
+        self.options = options
+        self._pipeline = pipeline(
+            'text-classification',
+            model=options['MODEL'],
+            top_k=None,
+            device=-1,  # CPU
+        )
+        self._batcher = MicroBatcher(
+            self._predict_batch,
+            options['MAX_BATCH_SIZE'],
+            options['MAX_WAIT_MS'] / 1000,
+            options['WORKERS'],
+        )
+
+    def _predict_batch(self, messages):
+        outputs = self._pipeline(messages, batch_size=len(messages), truncation=True)
+        return [_scores_to_analysis(message, scores) for message, scores in zip(messages, outputs)]
+
+    def submit(self, message):
+        # 배치 큐에 넣고 바로 Future를 반환 (LLM 응답을 기다리는 동안 분류가 함께 진행됨)
+        return self._batcher.submit(message)
+
+    def classify(self, message):
+        return self.submit(message).result()
+
+    async def aclassify(self, message):
+        return await asyncio.wrap_future(self.submit(message))
+
+
+_classifier = None
+_classifier_error = None
+_classifier_lock = threading.Lock()
+
+
+def get_classifier():
+    # 모델은 프로세스당 한 번만 로드. 로드에 실패하면 그 오류를 기억해 호출마다 다시 시도하지 않음
+    global _classifier, _classifier_error
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                if _classifier_error is not None:
+                    raise RuntimeError("로컬 분석기를 불러오지 못했습니다") from _classifier_error
+                try:
+                    _classifier = LocalMessageClassifier(get_classifier_settings())
+                except Exception as e:
+                    _classifier_error = e
+                    raise
+    return _classifier
+
+
+async def aget_classifier():
+    # 처음 한 번의 모델 로드는 이벤트 루프를 막지 않도록 스레드에서 실행
+    if _classifier is not None:
+        return _classifier
+    return await sync_to_async(get_classifier, thread_sensitive=False)()
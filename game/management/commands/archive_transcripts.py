@@ -0,0 +1,36 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from game.db_router import shard_aliases, use_shard
+from game.transcripts import DEFAULT_DELETE_BATCH_SIZE, archive_completed_sessions
+
+
+class Command(BaseCommand):
+    help = "완료된 지 오래된 세션의 대화 기록을 GameResult에 압축 보관하고 Dialogue 행을 삭제합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=float, default=None,
+                            help="완료 후 이 기간(일)이 지난 세션만 보관 (기본: TRANSCRIPT_ARCHIVE_AFTER_DAYS)")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_DELETE_BATCH_SIZE,
+                            help="한 번에 삭제할 Dialogue 행 수")
+        parser.add_argument('--interval', type=float, default=None,
+                            help="지정하면 종료하지 않고 이 간격(초)마다 반복 실행")
+
+    def handle(self, *args, **options):
+        older_than = None
+        if options['older_than_days'] is not None:
+            older_than = timedelta(days=options['older_than_days'])
+
+        while True:
+            archived = deleted = 0
+            for alias in shard_aliases():
+                with use_shard(alias):
+                    shard_archived, shard_deleted = archive_completed_sessions(older_than, options['batch_size'])
+                archived += shard_archived
+                deleted += shard_deleted
+            self.stdout.write(self.style.SUCCESS(f"보관한 세션 {archived}개, 삭제한 대화 {deleted}개"))
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from game.db_router import shard_aliases, use_shard
+from game.session_expiry import DEFAULT_BATCH_SIZE, expire_sessions
+
+
+class Command(BaseCommand):
+    help = "제한 시간이 지난 활성 게임 세션을 종료하고 GameResult를 기록합니다. (cron 등으로 주기 실행)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help="한 번의 UPDATE/INSERT로 처리할 세션 수")
+        parser.add_argument('--interval', type=float, default=None,
+                            help="지정하면 종료하지 않고 이 간격(초)마다 반복 실행")
+
+    def handle(self, *args, **options):
+        while True:
+            expired = 0
+            for alias in shard_aliases():
+                with use_shard(alias):
+                    expired += expire_sessions(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"만료된 게임 세션 {expired}개 종료"))
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,124 @@
+import time
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from game.db_router import use_shard
+from game.lexicon import get_lexicon
+from game.models import Dialogue, GameResult
+from game.transcripts import unpack_transcript
+
+# 보관본(GameResult.transcript_archive)을 한 번에 읽어 올 세션 수
+ARCHIVE_BATCH_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = "현재 점수 사전으로 Dialogue 기록 전체(압축 보관된 대화 포함)를 일괄 재채점합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help="한 번에 읽어 분석할 Dialogue 행 수")
+        parser.add_argument('--speaker', default=None,
+                            help="특정 화자의 대사만 재채점 (예: 영웅)")
+        parser.add_argument('--session', type=int, default=None,
+                            help="특정 게임 세션만 재채점")
+        parser.add_argument('--output', default=None,
+                            help="청크별 결과(.npz)를 저장할 디렉터리")
+        parser.add_argument('--shard', default=None,
+                            help="샤딩을 쓰는 경우 재채점할 샤드 DB alias (GAME_DATABASE_ROUTING['SHARDS'])")
+
+    def handle(self, *args, **options):
+        with use_shard(options['shard']):
+            self.rescore(**options)
+
+    def rescore(self, **options):
+        lexicon = get_lexicon()
+        chunk_size = options['chunk_size']
+        output_dir = Path(options['output']) if options['output'] else None
+        if output_dir:
+            output_dir.mkdir(parents=True, exist_ok=True)
+
+        started = time.monotonic()
+        total = 0
+        score_sum = 0
+        emotion_score_sum = 0
+        keyword_totals = np.zeros(len(lexicon.keywords), dtype=np.int64)
+        chunk_index = 0
+
+        for rows in self.iter_chunks(chunk_size, options['speaker'], options['session']):
+            ids = np.array([row[0] for row in rows], dtype=np.int64)
+            result = lexicon.analyze_batch(row[1] for row in rows)
+
+            total += len(rows)
+            score_sum += int(result['score'].sum())
+            emotion_score_sum += int(result['emotion_score'].sum())
+            keyword_totals += result['keyword_counts'].sum(axis=0)
+
+            if output_dir:
+                np.savez_compressed(
+                    output_dir / f'chunk_{chunk_index:05d}.npz',
+                    ids=ids,
+                    keywords=np.array(lexicon.keywords),
+                    **result,
+                )
+
+            last_id = rows[-1][0]
+            chunk_index += 1
+            self.stdout.write(f"{total}개 처리 (마지막 id {last_id})")
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"재채점 완료: {total}개, {elapsed:.1f}초 ({total / elapsed if elapsed else 0:.0f}개/초), "
+            f"사전 버전 {lexicon.version}"
+        ))
+        if total:
+            self.stdout.write(f"평균 점수 {score_sum / total:.3f}, 평균 감정 점수 {emotion_score_sum / total:.3f}")
+            top = sorted(zip(lexicon.keywords, keyword_totals.tolist()), key=lambda item: -item[1])[:10]
+            self.stdout.write("자주 쓰인 키워드: " + ", ".join(f"{word}({count})" for word, count in top if count))
+
+    def iter_chunks(self, chunk_size, speaker=None, session=None):
+        # 남아 있는 Dialogue 행을 먼저, 그다음 보관본에서 복원한 대화를 chunk_size개씩 (id, content) 목록으로 반환
+        yield from self.iter_dialogue_chunks(chunk_size, speaker, session)
+        yield from self.iter_archived_chunks(chunk_size, speaker, session)
+
+    def iter_dialogue_chunks(self, chunk_size, speaker, session):
+        # 보관된 세션은 보관본에서 읽으므로 제외 (purge 전이라 행이 남아 있어도 두 번 세지 않음)
+        queryset = Dialogue.objects.exclude(game_session__game_result__archived_at__isnull=False).order_by('id')
+        if speaker:
+            queryset = queryset.filter(speaker=speaker)
+        if session:
+            queryset = queryset.filter(game_session_id=session)
+
+        last_id = 0
+        while True:
+            # id 기준 keyset 방식으로 청크를 읽어 OFFSET 스캔 없이 테이블 끝까지 진행
+            rows = list(queryset.filter(id__gt=last_id).values_list('id', 'content')[:chunk_size])
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+
+    def iter_archived_chunks(self, chunk_size, speaker, session):
+        # purge_archived_dialogues 이후에는 Dialogue 행이 없으므로 GameResult의 압축 보관본을 풀어서 읽음
+        results = GameResult.objects.filter(archived_at__isnull=False, transcript_archive__isnull=False).order_by('id')
+        if session:
+            results = results.filter(game_session_id=session)
+
+        rows = []
+        last_id = 0
+        while True:
+            batch = list(results.filter(id__gt=last_id).values_list('id', 'transcript_archive')[:ARCHIVE_BATCH_SIZE])
+            if not batch:
+                break
+            for _, archive in batch:
+                for dialogue in unpack_transcript(archive):
+                    if speaker and dialogue.speaker != speaker:
+                        continue
+                    rows.append((dialogue.id, dialogue.content))
+                    if len(rows) == chunk_size:
+                        yield rows
+                        rows = []
+            last_id = batch[-1][0]
+        if rows:
+            yield rows
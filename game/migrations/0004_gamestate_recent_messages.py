@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0003_gameresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamestate',
+            name='recent_messages',
+            field=models.JSONField(default=list),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0004_gamestate_recent_messages'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamestate',
+            name='conversation_summary',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
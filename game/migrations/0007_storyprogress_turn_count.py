@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:54
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_turn_count(apps, schema_editor):
+    # 기존 세션: 턴마다 대화 2줄이 저장되므로 대화 수의 절반(올림)을 턴 수로 사용
+    StoryProgress = apps.get_model('game', 'StoryProgress')
+    Dialogue = apps.get_model('game', 'Dialogue')
+    db_alias = schema_editor.connection.alias
+    dialogue_count = Dialogue.objects.filter(game_session=OuterRef('game_session')).order_by().values(
+        'game_session').annotate(count=Count('id')).values('count')
+    StoryProgress.objects.using(db_alias).update(
+        turn_count=(Coalesce(Subquery(dialogue_count, output_field=IntegerField()), Value(0)) + 1) / 2
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0006_gamestate_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storyprogress',
+            name='turn_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_turn_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0007_storyprogress_turn_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['start_time'], name='game_session_active_start_idx'),
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+GAME_OVER = 'game_over_event'
+
+
+def copy_plot_points(apps, schema_editor):
+    # 기존 plot_points JSON을 PlotEvent 행으로 옮기고 종료 플래그/마지막 이벤트 컬럼을 채움
+    StoryProgress = apps.get_model('game', 'StoryProgress')
+    PlotEvent = apps.get_model('game', 'PlotEvent')
+    db_alias = schema_editor.connection.alias
+    for story_progress in StoryProgress.objects.using(db_alias).iterator():
+        points = story_progress.plot_points if isinstance(story_progress.plot_points, list) else []
+        events = []
+        for point in points:
+            if isinstance(point, dict):
+                point_type = str(point.get('type') or 'unknown')
+                events.append(PlotEvent(
+                    game_session_id=story_progress.game_session_id,
+                    event_type=point_type[:50],
+                    chapter=point.get('chapter') or story_progress.current_chapter,
+                    description=str(point.get('description') or '')[:200],
+                    impact=point.get('impact') or {},
+                ))
+            else:
+                events.append(PlotEvent(
+                    game_session_id=story_progress.game_session_id,
+                    event_type=str(point)[:50],
+                    chapter=story_progress.current_chapter,
+                ))
+        if not events:
+            continue
+        PlotEvent.objects.using(db_alias).bulk_create(events)
+        StoryProgress.objects.using(db_alias).filter(pk=story_progress.pk).update(
+            last_event_type=events[-1].event_type,
+            game_over=any(event.event_type == GAME_OVER for event in events),
+        )
+
+
+def restore_plot_points(apps, schema_editor):
+    StoryProgress = apps.get_model('game', 'StoryProgress')
+    PlotEvent = apps.get_model('game', 'PlotEvent')
+    db_alias = schema_editor.connection.alias
+    events = PlotEvent.objects.using(db_alias)
+    for story_progress in StoryProgress.objects.using(db_alias).iterator():
+        story_progress.plot_points = [
+            {
+                "type": event.event_type,
+                "chapter": event.chapter,
+                "description": event.description,
+                "impact": event.impact,
+            }
+            for event in events.filter(game_session_id=story_progress.game_session_id).order_by('id')
+        ]
+        story_progress.save(update_fields=['plot_points'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0008_gamesession_active_start_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storyprogress',
+            name='game_over',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='storyprogress',
+            name='last_event_type',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='storyprogress',
+            name='story_path',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='PlotEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(max_length=50)),
+                ('chapter', models.IntegerField()),
+                ('description', models.CharField(blank=True, default='', max_length=200)),
+                ('impact', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('game_session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='plot_events', to='game.gamesession')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['game_session', 'id'], name='plot_event_session_idx'), models.Index(fields=['event_type', 'created_at'], name='plot_event_type_idx')],
+            },
+        ),
+        migrations.RunPython(copy_plot_points, restore_plot_points),
+        migrations.RemoveField(
+            model_name='storyprogress',
+            name='plot_points',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0009_plotevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dialogue',
+            index=models.Index(fields=['game_session', 'timestamp', 'id'], name='dialogue_session_time_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0010_dialogue_session_time_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameresult',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gameresult',
+            name='transcript_archive',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from game.db_router import get_routing_settings
+
+
+class AlterFieldOnShards(migrations.AlterField):
+    """
+    Player.user의 DB 외래 키 제약은 primary가 아닌 DB(샤드)에서만 제거 (User는 항상 primary에 있음).
+    샤딩하지 않거나 primary를 샤드로도 쓰면 Player와 User가 같은 DB에 있으므로 제약을 그대로 둠.
+    """
+
+    def _on_shard(self, schema_editor):
+        return schema_editor.connection.alias != get_routing_settings()['PRIMARY']
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if self._on_shard(schema_editor):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if self._on_shard(schema_editor):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0011_gameresult_transcript_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AlterFieldOnShards(
+            model_name='player',
+            name='user',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
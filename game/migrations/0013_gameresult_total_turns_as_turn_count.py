@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:10
+
+from django.db import migrations
+from django.db.models import F
+
+
+def dialogue_lines_to_turns(apps, schema_editor):
+    # 이전 GameResult.total_turns는 대화 줄 수(턴마다 2줄)였으므로 StoryProgress.turn_count와 같은 턴 수로 변환
+    GameResult = apps.get_model('game', 'GameResult')
+    GameResult.objects.using(schema_editor.connection.alias).update(total_turns=(F('total_turns') + 1) / 2)
+
+
+def turns_to_dialogue_lines(apps, schema_editor):
+    GameResult = apps.get_model('game', 'GameResult')
+    GameResult.objects.using(schema_editor.connection.alias).update(total_turns=F('total_turns') * 2)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0012_player_user_no_db_constraint'),
+    ]
+
+    operations = [
+        migrations.RunPython(dialogue_lines_to_turns, turns_to_dialogue_lines),
+    ]
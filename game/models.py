@@ -4,7 +4,9 @@ from django.utils import timezone
 
 
 class Player(models.Model):
-    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    # 샤딩하면 Player는 샤드에, User는 primary에 있으므로 샤드 DB에는 외래 키 제약을 두지 않음 (0012)
+    # 같은 이유로 User 삭제 시 CASCADE 대신 signals.delete_user_player가 사용자의 샤드에서 직접 지움
+    user = models.OneToOneField(User, on_delete=models.DO_NOTHING, db_constraint=False)
     name = models.CharField(max_length=100)
 
     def __str__(self):
@@ -28,6 +30,13 @@ class GameSession(models.Model):
         ('bad_ending', 'Bad Ending')
     ], default='ongoing')
 
+    class Meta:
+        indexes = [
+            # 만료 세션 정리(expire_sessions)용: 활성 세션만 start_time 순으로 색인
+            models.Index(fields=['start_time'], name='game_session_active_start_idx',
+                         condition=models.Q(is_active=True)),
+        ]
+
     def __str__(self):
         return f"Game Session for {self.player.username}"
 
@@ -37,14 +46,60 @@ class Dialogue(models.Model):
     speaker = models.CharField(max_length=10, choices=[('player', 'Player'), ('demon_lord', 'Demon Lord')])
     content = models.TextField()
 
+    class Meta:
+        indexes = [
+            # 세션별 대화 기록을 시간순으로 읽는 keyset 페이지네이션용 (game/transcripts.py)
+            models.Index(fields=['game_session', 'timestamp', 'id'], name='dialogue_session_time_idx'),
+        ]
+
 class StoryProgress(models.Model):
     game_session = models.OneToOneField(GameSession, on_delete=models.CASCADE)
     current_chapter = models.IntegerField(default=1)
     progress = models.IntegerField(default=0)  # 'chapter_progress'를 'progress'로 변경
-    plot_points = models.JSONField(default=list)
+    turn_count = models.PositiveIntegerField(default=0)  # 완료된 턴 수 (턴 저장 시 함께 증가, 종료 조건 확인용)
+    # PlotEvent에서 종료 조건/분기 확인에 필요한 값만 옮겨 둔 컬럼 (이벤트 기록 시 함께 갱신)
+    story_path = models.CharField(max_length=20, blank=True, default='')
+    last_event_type = models.CharField(max_length=50, blank=True, default='')
+    game_over = models.BooleanField(default=False)
+
+    @property
+    def plot_points(self):
+        # 이전 plot_points JSON과 같은 모양의 읽기 전용 목록 (PlotEvent에서 구성)
+        return [event.as_plot_point() for event in self.game_session.plot_events.all()]
+
     def __str__(self):
         return f"Story Progress for Game Session {self.game_session.id}"
 
+
+class PlotEvent(models.Model):
+    # 스토리 진행 중 발생한 플롯 이벤트 (추가만 하고 수정하지 않음)
+    GAME_OVER = 'game_over_event'
+
+    game_session = models.ForeignKey(GameSession, on_delete=models.CASCADE, related_name='plot_events')
+    event_type = models.CharField(max_length=50)
+    chapter = models.IntegerField()
+    description = models.CharField(max_length=200, blank=True, default='')
+    impact = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['game_session', 'id'], name='plot_event_session_idx'),
+            models.Index(fields=['event_type', 'created_at'], name='plot_event_type_idx'),
+        ]
+
+    def as_plot_point(self):
+        return {
+            "type": self.event_type,
+            "chapter": self.chapter,
+            "description": self.description,
+            "impact": self.impact,
+        }
+
+    def __str__(self):
+        return f"{self.event_type} (chapter {self.chapter}) for Game Session {self.game_session_id}"
+
 class GameState(models.Model):
     game_session = models.OneToOneField(GameSession, on_delete=models.CASCADE)
     player_persuasion_level = models.IntegerField(default=0)  # 플레이어의 설득력 수준
@@ -53,6 +108,9 @@ class GameState(models.Model):
     demon_lord_emotional_state = models.CharField(max_length=50, default='hostile')  # 마왕의 감정 상태
     argument_strength = models.IntegerField(default=0)  # 현재 논점의 강도
     environmental_factors = models.JSONField(default=dict)  # 예: 대화 장소, 시간 등
+    recent_messages = models.JSONField(default=list)  # 프롬프트용 최근 대화 기록 (최근 N턴만 유지)
+    conversation_summary = models.TextField(blank=True, default='')  # recent_messages에서 밀려난 대화의 누적 요약
+    version = models.PositiveIntegerField(default=0)  # 턴이 저장될 때마다 증가 (동시 수정 감지용)
 
 class GameResult(models.Model):
     game_session = models.OneToOneField(GameSession, on_delete=models.CASCADE, related_name='game_result')
@@ -63,5 +121,8 @@ class GameResult(models.Model):
     final_chapter = models.IntegerField()
     total_turns = models.IntegerField()
     duration = models.DurationField()
+    # 완료 후 일정 기간이 지나면 대화 기록을 압축해 보관하고 Dialogue 행은 삭제 (archive_transcripts 명령)
+    transcript_archive = models.BinaryField(null=True, blank=True, editable=False)
+    archived_at = models.DateTimeField(null=True, blank=True)
     def __str__(self):
         return f"Game Result for Session {self.game_session.id} - {self.result}"
\ No newline at end of file
@@ -0,0 +1,86 @@
+# game/prompt_budget.py
+import functools
+import logging
+import math
+
+from django.conf import settings
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken이 없으면 근사치로 계산
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROMPT_BUDGET = {
+    'HISTORY_TOKENS': 800,  # 프롬프트에 그대로 넣을 최근 대화의 토큰 한도
+    'SUMMARY_TOKENS': 300,  # 이전 대화 요약의 토큰 한도
+    'REPLY_MIN_TOKENS': 150,
+    'REPLY_MAX_TOKENS': 600,
+    'STRUCTURED_OVERHEAD_TOKENS': 80,  # JSON 응답(분석 결과 포함)에 추가로 필요한 토큰
+}
+
+
+def budget(name):
+    return {**DEFAULT_PROMPT_BUDGET, **getattr(settings, 'PROMPT_BUDGET', {})}[name]
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding('cl100k_base')
+    except Exception as e:
+        logger.warning(f"tiktoken 인코딩을 불러오지 못해 근사치를 사용합니다: {e}")
+        return None
+
+
+def count_tokens(text):
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # 근사치: 한글 한 글자(UTF-8 3바이트)는 약 1토큰, 영문은 3~4글자당 1토큰
+    return math.ceil(len(text.encode('utf-8')) / 3)
+
+
+def message_tokens(message):
+    return count_tokens(message.get('content', '')) + 4  # 화자 표시 등 포맷 오버헤드
+
+
+def split_by_budget(messages, max_messages, token_budget):
+    # 최근 메시지부터 예산 안에 들어가는 만큼만 남기고, 나머지(오래된 순)를 반환
+    kept = []
+    used = 0
+    for message in reversed(messages[-max_messages:] if max_messages else []):
+        cost = message_tokens(message)
+        if kept and used + cost > token_budget:
+            break
+        kept.append(message)
+        used += cost
+    kept.reverse()
+    return kept, messages[:len(messages) - len(kept)]
+
+
+def truncate_to_tokens(text, limit):
+    # 요약이 예산을 넘으면 오래된 앞부분을 잘라냄
+    if count_tokens(text) <= limit:
+        return text
+    lines = text.splitlines()
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > limit:
+        lines.pop(0)
+    text = "\n".join(lines)
+    while text and count_tokens(text) > limit:
+        text = text[len(text) // 4:]
+    return text
+
+
+def reply_max_tokens(player_message, structured=False):
+    # 기대 응답 길이에 맞춰 max_tokens 산정 (플레이어 메시지가 길수록 응답도 길어지는 경향)
+    expected = budget('REPLY_MIN_TOKENS') + 2 * count_tokens(player_message)
+    expected = min(expected, budget('REPLY_MAX_TOKENS'))
+    if structured:
+        expected += budget('STRUCTURED_OVERHEAD_TOKENS')
+    return expected
@@ -0,0 +1,147 @@
+# game/realtime.py
+import asyncio
+import json
+import logging
+import re
+from http.cookies import SimpleCookie
+from importlib import import_module
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http.request import validate_host
+from django.utils.http import is_same_domain
+
+from .db_router import activate_for_user
+from .event_broker import recent_game_events, subscribe_game_events
+from .session_auth import session_user_id
+from .state_snapshot import get_snapshot
+
+logger = logging.getLogger(__name__)
+
+WEBSOCKET_PATH_RE = re.compile(r'^/ws/game/(?P<game_session_id>\d+)/$')
+
+# WebSocket close codes (4000번대는 애플리케이션 정의)
+CLOSE_NOT_FOUND = 4404
+CLOSE_FORBIDDEN = 4403
+
+
+def _session_key_from_scope(scope):
+    cookie = SimpleCookie()
+    for name, value in scope.get('headers', ()):
+        if name == b'cookie':
+            cookie.load(value.decode('latin-1'))
+    morsel = cookie.get(settings.SESSION_COOKIE_NAME)
+    return morsel.value if morsel else None
+
+
+def _origin_allowed(scope):
+    """
+    브라우저는 WebSocket에 CSRF 보호를 적용하지 않으므로, Origin 호스트가 ALLOWED_HOSTS(DEBUG에서 비어 있으면
+    localhost)나 CSRF_TRUSTED_ORIGINS에 있을 때만 연결을 받음 (Channels의 AllowedHostsOriginValidator와 같은 규칙).
+    Origin 헤더가 없으면 거부.
+    """
+    origin = None
+    for name, value in scope.get('headers', ()):
+        if name == b'origin':
+            origin = value.decode('latin-1')
+    if not origin:
+        return False
+    parsed = urlsplit(origin.lower())
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        return False
+
+    for trusted in settings.CSRF_TRUSTED_ORIGINS:
+        trusted = urlsplit(trusted.lower())
+        if trusted.scheme == parsed.scheme and is_same_domain(parsed.netloc, trusted.netloc):
+            return True
+
+    allowed_hosts = settings.ALLOWED_HOSTS
+    if settings.DEBUG and not allowed_hosts:
+        allowed_hosts = ['.localhost', '127.0.0.1', '[::1]']
+    host = f'[{parsed.hostname}]' if ':' in parsed.hostname else parsed.hostname
+    return validate_host(host, allowed_hosts)
+
+
+def _session_user_id(session_key):
+    # 세션 쿠키의 로그인 사용자 id (HTTP 뷰와 같이 세션 인증 해시와 is_active 확인)
+    close_old_connections()
+    try:
+        if not session_key:
+            return None
+        return session_user_id(import_module(settings.SESSION_ENGINE).SessionStore(session_key))
+    finally:
+        close_old_connections()
+
+
+def _session_owner_check(user_id, game_session_id):
+    # 로그인 사용자가 게임 세션의 주인인지 확인 (api_get_game_state와 같은 스냅샷 사용)
+    close_old_connections()
+    try:
+        snapshot = get_snapshot(game_session_id)
+        return snapshot is not None and snapshot['owner_id'] == str(user_id)
+    finally:
+        close_old_connections()
+
+
+async def _send_event(send, event):
+    await send({'type': 'websocket.send', 'text': json.dumps(event, ensure_ascii=False)})
+
+
+async def _pump_events(send, subscription, last_seq):
+    async for event in subscription:
+        # 구독 직후 최근 기록으로 이미 보낸 이벤트는 건너뜀
+        if event['seq'] > last_seq:
+            await _send_event(send, event)
+
+
+async def websocket_application(scope, receive, send):
+    """
+    ws/game/<id>/: 게임 세션의 이벤트(turn, state, game_end)를 발행 즉시 전달.
+    ?after=<seq>를 주면 그 이후의 최근 이벤트부터 다시 보냄. 클라이언트가 보내는 메시지는 무시함.
+    연결 하나는 브로커의 Queue 하나와 대기 중인 태스크 하나만 사용함.
+    """
+    match = WEBSOCKET_PATH_RE.match(scope['path'])
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    if match is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+
+    if not _origin_allowed(scope):
+        await send({'type': 'websocket.close', 'code': CLOSE_FORBIDDEN})
+        return
+
+    game_session_id = int(match.group('game_session_id'))
+    user_id = await sync_to_async(_session_user_id)(_session_key_from_scope(scope))
+    if user_id is not None:
+        # HTTP 요청과 같이 게임 세션 조회와 이벤트 토픽이 사용자의 샤드를 따르게 함
+        activate_for_user(user_id)
+    if user_id is None or not await sync_to_async(_session_owner_check)(user_id, game_session_id):
+        await send({'type': 'websocket.close', 'code': CLOSE_FORBIDDEN})
+        return
+
+    try:
+        after = int(parse_qs(scope.get('query_string', b'').decode()).get('after', ['0'])[0])
+    except ValueError:
+        after = 0
+
+    subscription = subscribe_game_events(game_session_id)
+    pump = None
+    try:
+        await send({'type': 'websocket.accept'})
+        last_seq = after
+        for event in recent_game_events(game_session_id, after):
+            await _send_event(send, event)
+            last_seq = event['seq']
+        pump = asyncio.create_task(_pump_events(send, subscription, last_seq))
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+    finally:
+        subscription.close()
+        if pump is not None:
+            pump.cancel()
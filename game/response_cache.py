@@ -0,0 +1,127 @@
+# game/response_cache.py
+import hashlib
+import logging
+import random
+import re
+import threading
+import unicodedata
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SETTINGS = {
+    'ENABLED': True,
+    'ALIAS': 'default',
+    'TIMEOUT': 60 * 60,
+    'VARIETY': 1,
+}
+
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'stores': 0}
+
+
+def get_cache_settings():
+    return {**DEFAULT_CACHE_SETTINGS, **getattr(settings, 'DEMON_LORD_RESPONSE_CACHE', {})}
+
+
+def _get_cache():
+    return caches[get_cache_settings()['ALIAS']]
+
+
+def normalize_message(message):
+    # 대소문자, 전각/반각, 문장부호, 공백 차이를 무시 ("평화를 원한다!" == "평화를  원한다")
+    message = unicodedata.normalize('NFKC', message).lower()
+    message = _PUNCTUATION_RE.sub(' ', message)
+    return _WHITESPACE_RE.sub(' ', message).strip()
+
+
+def make_cache_key(namespace, player_message, attitude, chapter):
+    raw = f"{chapter}|{attitude}|{normalize_message(player_message)}"
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    return f"demon_lord:{namespace}:{digest}"
+
+
+def _record(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def get_cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def _pick_candidate(candidates):
+    # VARIETY 개수만큼 후보가 모이기 전까지는 미스로 처리해 새 응답을 생성하게 함
+    if not candidates or len(candidates) < get_cache_settings()['VARIETY']:
+        _record('misses')
+        return None
+    _record('hits')
+    return random.choice(candidates)
+
+
+def _append_candidate(candidates, value):
+    variety = max(1, get_cache_settings()['VARIETY'])
+    candidates = list(candidates or [])
+    candidates.append(value)
+    return candidates[-variety:]
+
+
+def get_cached_response(cache_key):
+    if not get_cache_settings()['ENABLED']:
+        return None
+    try:
+        return _pick_candidate(_get_cache().get(cache_key))
+    except Exception as e:
+        logger.warning(f"응답 캐시 조회 실패: {e}")
+        return None
+
+
+def store_response(cache_key, value):
+    cache_settings = get_cache_settings()
+    if not cache_settings['ENABLED']:
+        return
+    try:
+        cache = _get_cache()
+        candidates = _append_candidate(cache.get(cache_key), value)
+        cache.set(cache_key, candidates, cache_settings['TIMEOUT'])
+        _record('stores')
+    except Exception as e:
+        logger.warning(f"응답 캐시 저장 실패: {e}")
+
+
+async def aget_cached_response(cache_key):
+    if not get_cache_settings()['ENABLED']:
+        return None
+    try:
+        return _pick_candidate(await _get_cache().aget(cache_key))
+    except Exception as e:
+        logger.warning(f"응답 캐시 조회 실패: {e}")
+        return None
+
+
+async def astore_response(cache_key, value):
+    cache_settings = get_cache_settings()
+    if not cache_settings['ENABLED']:
+        return
+    try:
+        cache = _get_cache()
+        candidates = _append_candidate(await cache.aget(cache_key), value)
+        await cache.aset(cache_key, candidates, cache_settings['TIMEOUT'])
+        _record('stores')
+    except Exception as e:
+        logger.warning(f"응답 캐시 저장 실패: {e}")
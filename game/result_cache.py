@@ -0,0 +1,77 @@
+# game/result_cache.py
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .db_router import shard_cache_prefix
+from .models import GameSession
+
+DEFAULT_RESULT_CACHE_SETTINGS = {
+    'CACHE_ALIAS': 'game_results',
+    'TIMEOUT': 24 * 60 * 60,
+}
+
+
+def get_result_cache_settings():
+    return {**DEFAULT_RESULT_CACHE_SETTINGS, **getattr(settings, 'GAME_RESULT_CACHE', {})}
+
+
+def _cache():
+    return caches[get_result_cache_settings()['CACHE_ALIAS']]
+
+
+def _meta_key(game_session_id):
+    return f'game-result-meta:{shard_cache_prefix()}{game_session_id}'
+
+
+def _page_key(meta, cursor, csrf_cookie):
+    # 세션 + 세대 + 페이지(cursor) + CSRF 쿠키별로 저장 (페이지에 포함된 CSRF 토큰이 쿠키와 맞아야 함)
+    digest = hashlib.sha1(f'{cursor}|{csrf_cookie}'.encode('utf-8')).hexdigest()
+    return f"game-result-page:{meta['game_session_id']}:{meta['generation']}:{digest}"
+
+
+def get_result_meta(game_session_id):
+    """
+    권한/완료 여부 확인용 요약 (소유자, 완료 여부, 종료 시각). 세션이 없으면 None.
+    완료된 세션은 바뀌지 않으므로 캐시하고, 보관/삭제 시에만 invalidate_result_cache로 지움.
+    """
+    cache = _cache()
+    meta = cache.get(_meta_key(game_session_id))
+    if meta is not None:
+        return meta
+
+    row = GameSession.objects.filter(id=game_session_id).values(
+        'player__user_id', 'is_completed', 'end_time', 'game_result__end_time').first()
+    if row is None:
+        return None
+    meta = {
+        'game_session_id': game_session_id,
+        'owner_id': str(row['player__user_id']),
+        'is_completed': row['is_completed'],
+        'last_modified': row['end_time'] or row['game_result__end_time'],
+        'generation': uuid.uuid4().hex,
+    }
+    if meta['is_completed']:
+        cache.add(_meta_key(game_session_id), meta, get_result_cache_settings()['TIMEOUT'])
+    return meta
+
+
+def get_cached_page(meta, cursor, csrf_cookie):
+    return _cache().get(_page_key(meta, cursor, csrf_cookie))
+
+
+def store_page(meta, cursor, csrf_cookie, content):
+    page = {
+        'content': content,
+        'etag': '"' + hashlib.sha1(content).hexdigest() + '"',
+        'last_modified': meta['last_modified'],
+    }
+    _cache().set(_page_key(meta, cursor, csrf_cookie), page, get_result_cache_settings()['TIMEOUT'])
+    return page
+
+
+def invalidate_result_cache(game_session_ids):
+    # 세대 정보를 지우면 이전 페이지 캐시는 더 이상 참조되지 않고 TIMEOUT/LRU로 사라짐
+    _cache().delete_many([_meta_key(game_session_id) for game_session_id in game_session_ids])
@@ -0,0 +1,71 @@
+# game/session_auth.py
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare
+
+DEFAULT_SESSION_AUTH_SETTINGS = {
+    'CACHE_ALIAS': 'game_state_snapshots',
+    'TIMEOUT': 10 * 60,
+}
+
+
+def get_session_auth_settings():
+    return {**DEFAULT_SESSION_AUTH_SETTINGS, **getattr(settings, 'GAME_SESSION_AUTH', {})}
+
+
+def _cache():
+    return caches[get_session_auth_settings()['CACHE_ALIAS']]
+
+
+def _cache_key(user_id):
+    return f'session-auth:{user_id}'
+
+
+def _valid_hashes(user_id):
+    """
+    사용자의 유효한 세션 인증 해시 목록 (SECRET_KEY_FALLBACKS 포함).
+    비활성 사용자나 없는 사용자면 빈 목록. 비밀번호/활성 상태가 바뀌면 signals에서 지움.
+    """
+    cache = _cache()
+    key = _cache_key(user_id)
+    hashes = cache.get(key)
+    if hashes is not None:
+        return hashes
+
+    user = get_user_model()._default_manager.filter(pk=user_id).first()
+    if user is None or not user.is_active:
+        hashes = []
+    else:
+        hashes = [user.get_session_auth_hash(), *user.get_session_auth_fallback_hash()]
+    cache.add(key, hashes, get_session_auth_settings()['TIMEOUT'])
+    return hashes
+
+
+def _check(user_id, session_hash):
+    if user_id is None or not session_hash:
+        return None
+    if not any(constant_time_compare(session_hash, valid) for valid in _valid_hashes(user_id)):
+        return None
+    return user_id
+
+
+def session_user_id(session):
+    """
+    세션의 로그인 사용자 id. request.user와 같이 세션 인증 해시(비밀번호 변경 시 로그아웃)와
+    is_active를 확인하되, 결과를 캐시해 요청마다 User 테이블을 조회하지 않음. 유효하지 않으면 None.
+    """
+    return _check(session.get(SESSION_KEY), session.get(HASH_SESSION_KEY))
+
+
+async def asession_user_id(session):
+    user_id = await session.aget(SESSION_KEY)
+    session_hash = await session.aget(HASH_SESSION_KEY)
+    if user_id is None or not session_hash:
+        return None
+    return await sync_to_async(_check)(user_id, session_hash)
+
+
+def invalidate_session_auth(user_ids):
+    _cache().delete_many([_cache_key(user_id) for user_id in user_ids])
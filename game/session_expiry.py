@@ -0,0 +1,92 @@
+# game/session_expiry.py
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .db_router import game_db
+from .models import GameSession, GameResult
+from .state_snapshot import invalidate_snapshots
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_TIME_LIMIT = 3600  # 초
+DEFAULT_BATCH_SIZE = 500
+
+TIMEOUT_RESULT = '시간 초과'
+
+
+def session_time_limit():
+    return timedelta(seconds=getattr(settings, 'GAME_SESSION_TIME_LIMIT', DEFAULT_SESSION_TIME_LIMIT))
+
+
+def is_session_expired(game_session, now=None):
+    return (now or timezone.now()) - game_session.start_time > session_time_limit()
+
+
+def _expire_batch(cutoff, now, batch_size):
+    # 제한 시간이 지난 활성 세션을 한 배치씩 잠그고 (진행 중인 다른 sweep과 겹치지 않게 skip_locked)
+    # 세션 종료는 UPDATE 한 번, GameResult는 bulk_create 한 번으로 처리
+    using = game_db()
+    with transaction.atomic(using=using):
+        rows = list(
+            GameSession.objects
+            .select_for_update(skip_locked=True, of=('self',))
+            .filter(is_active=True, start_time__lt=cutoff)
+            .order_by('start_time')
+            .values(
+                'id',
+                'start_time',
+                'gamestate__player_persuasion_level',
+                'gamestate__demon_lord_resistance',
+                'storyprogress__current_chapter',
+                'storyprogress__turn_count',
+            )[:batch_size]
+        )
+        if not rows:
+            return 0
+
+        GameSession.objects.filter(id__in=[row['id'] for row in rows], is_active=True).update(
+            is_active=False,
+            is_completed=True,
+            end_time=now,
+            result=TIMEOUT_RESULT,
+        )
+        GameResult.objects.bulk_create(
+            [
+                GameResult(
+                    game_session_id=row['id'],
+                    result=TIMEOUT_RESULT,
+                    final_persuasion_level=row['gamestate__player_persuasion_level'] or 0,
+                    final_demon_resistance=(
+                        100 if row['gamestate__demon_lord_resistance'] is None
+                        else row['gamestate__demon_lord_resistance']
+                    ),
+                    final_chapter=row['storyprogress__current_chapter'] or 1,
+                    total_turns=row['storyprogress__turn_count'] or 0,
+                    duration=now - row['start_time'],
+                )
+                for row in rows
+            ],
+            ignore_conflicts=True,  # 마지막 턴에서 이미 결과가 저장된 세션
+        )
+        expired_ids = [row['id'] for row in rows]
+        transaction.on_commit(lambda: invalidate_snapshots(expired_ids), using=using)
+        return len(rows)
+
+
+def expire_sessions(batch_size=DEFAULT_BATCH_SIZE, now=None):
+    # 플레이어가 떠나 메시지가 오지 않는 세션도 제한 시간이 지나면 종료 처리. 종료한 세션 수를 반환
+    now = now or timezone.now()
+    cutoff = now - session_time_limit()
+    total = 0
+    while True:
+        expired = _expire_batch(cutoff, now, batch_size)
+        total += expired
+        if expired < batch_size:
+            break
+    if total:
+        logger.info(f"제한 시간이 지난 게임 세션 {total}개를 종료했습니다.")
+    return total
@@ -0,0 +1,37 @@
+# game/signals.py
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .db_router import shard_for_user, use_shard
+from .models import GameResult, GameSession, Player
+from .result_cache import invalidate_result_cache
+from .session_auth import invalidate_session_auth
+
+
+@receiver(post_delete, sender=GameSession)
+@receiver(post_delete, sender=GameResult)
+def invalidate_deleted_result(sender, instance, using, **kwargs):
+    # 결과 페이지 캐시는 세션/결과가 삭제될 때(또는 대화 기록 보관 시)에만 무효화
+    game_session_id = instance.pk if sender is GameSession else instance.game_session_id
+    transaction.on_commit(lambda: invalidate_result_cache([game_session_id]), using=using)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_session_auth(sender, instance, using, update_fields=None, **kwargs):
+    # 비밀번호/활성 상태가 바뀔 수 있으므로 캐시된 세션 인증 해시를 지움 (로그인 시각만 갱신할 때는 제외)
+    # 커밋 전에 다른 요청이 이전 값을 다시 채울 수 있으므로 커밋 후에 한 번 더 지움
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    user_id = instance.pk
+    invalidate_session_auth([user_id])
+    transaction.on_commit(lambda: invalidate_session_auth([user_id]), using=using)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def delete_user_player(sender, instance, **kwargs):
+    # Player.user는 DO_NOTHING이므로 (샤딩하면 User와 다른 DB) 사용자의 샤드에서 Player와 게임 기록을 직접 지움
+    with use_shard(shard_for_user(instance.pk)):
+        Player.objects.filter(user_id=instance.pk).delete()
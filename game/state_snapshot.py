@@ -0,0 +1,80 @@
+# game/state_snapshot.py
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .db_router import shard_cache_prefix
+from .models import GameSession
+
+DEFAULT_SNAPSHOT_SETTINGS = {
+    'CACHE_ALIAS': 'game_state_snapshots',
+    'TIMEOUT': 10 * 60,
+}
+
+
+def get_snapshot_settings():
+    return {**DEFAULT_SNAPSHOT_SETTINGS, **getattr(settings, 'GAME_STATE_SNAPSHOT', {})}
+
+
+def _cache():
+    return caches[get_snapshot_settings()['CACHE_ALIAS']]
+
+
+def _cache_key(game_session_id):
+    return f'game-state:{shard_cache_prefix()}{game_session_id}'
+
+
+def build_snapshot(game_session):
+    # api_get_game_state 응답과 소유자, ETag를 묶은 읽기 전용 스냅샷
+    game_state = game_session.gamestate
+    story_progress = game_session.storyprogress
+    data = {
+        'player_persuasion_level': game_state.player_persuasion_level,
+        'demon_lord_resistance': game_state.demon_lord_resistance,
+        'player_emotional_state': game_state.player_emotional_state,
+        'demon_lord_emotional_state': game_state.demon_lord_emotional_state,
+        'argument_strength': game_state.argument_strength,
+        'current_chapter': story_progress.current_chapter,
+        'is_completed': game_session.is_completed,
+        'result': game_session.result if game_session.is_completed else None
+    }
+    # 턴마다 GameState.version이 오르고, 턴 밖에서의 종료(expire_sessions)는 is_completed/result로 구분
+    tag = f'{game_session.id}:{game_state.version}:{int(game_session.is_completed)}:{data["result"]}'
+    return {
+        'owner_id': str(game_session.player.user_id),
+        'etag': '"' + hashlib.sha1(tag.encode('utf-8')).hexdigest() + '"',
+        'data': data,
+    }
+
+
+def store_snapshot(game_session):
+    # 턴이 커밋된 뒤 최신 상태로 덮어씀
+    snapshot = build_snapshot(game_session)
+    _cache().set(_cache_key(game_session.id), snapshot, get_snapshot_settings()['TIMEOUT'])
+    return snapshot
+
+
+def invalidate_snapshots(game_session_ids):
+    _cache().delete_many([_cache_key(game_session_id) for game_session_id in game_session_ids])
+
+
+def get_snapshot(game_session_id):
+    """
+    캐시된 스냅샷을 반환하고, 없으면 DB에서 읽어 채움 (세션이 없으면 None).
+    DB에서 읽은 값은 add로만 넣어, 그 사이 커밋된 턴이 set한 더 새로운 스냅샷을 덮어쓰지 않음.
+    """
+    cache = _cache()
+    key = _cache_key(game_session_id)
+    snapshot = cache.get(key)
+    if snapshot is not None:
+        return snapshot
+
+    try:
+        game_session = GameSession.objects.select_related('player', 'gamestate', 'storyprogress').get(
+            id=game_session_id)
+    except GameSession.DoesNotExist:
+        return None
+    snapshot = build_snapshot(game_session)
+    cache.add(key, snapshot, get_snapshot_settings()['TIMEOUT'])
+    return snapshot
@@ -1,3 +1,735 @@
-from django.test import TestCase
+import asyncio
+import json
+import re
+from collections import Counter
+from concurrent.futures import Future
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import httpx
+import openai
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.signals import request_finished
+from django.db import connection, router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .chatbot import DEFAULT_PLAYER_ANALYSIS, agenerate_demon_lord_turn, analyze_player_message, \
+    generate_demon_lord_turn
+from .conversation_memory import schedule_summary_update
+from .db_router import (
+    GameDatabaseRouter, ShardNotSelectedError, activate_for_user, check_sticky_cache, database_routing_middleware,
+    is_pinned_to_primary, shard_for_user, use_shard,
+)
+from .event_broker import DEFAULT_EVENT_SETTINGS, LocalBroker
+from .game_logic import StaleGameStateError, apply_game_state_turn, update_story_progress
+from .lexicon import get_lexicon, get_lexicon_store
+from .llm_transport import CircuitBreaker, ConcurrencyLimiter, LLMCircuitOpenError, LLMTransport, TransportMetrics, \
+    _Waiter
+from .realtime import _origin_allowed
+from .session_auth import session_user_id
+from .models import Player, GameSession, GameState, StoryProgress, Dialogue, GameResult, PlotEvent
+from .transcripts import archive_session, purge_archived_dialogues, transcript_page, unpack_transcript
+
+# process_dialogue 한 턴이 쓸 수 있는 최대 쿼리 수
+# (세션 조회 1 + 트랜잭션(테스트에서는 SAVEPOINT/RELEASE) 2 + 세션 잠금(SELECT ... FOR UPDATE) 1
+#  + 대화 bulk INSERT 1 + GameState UPDATE 1 + PlotEvent INSERT 1(이벤트가 생긴 턴) + StoryProgress UPDATE 1)
+TURN_QUERY_BUDGET = 8
+# 게임이 끝나는 턴은 GameSession UPDATE와 GameResult INSERT(SAVEPOINT/RELEASE 포함)가 더해짐
+ENDING_TURN_QUERY_BUDGET = TURN_QUERY_BUDGET + 4
+
+DEMON_LORD_TURN = (
+    "어리석은 인간이여, 그 말을 믿으라는 것이냐.",
+    {"length": 22, "sentiment": "neutral"},
+    {"persuasion_strength": 5, "emotional_impact": "중립적", "primary_approach": "논리적"},
+)
+
+
+class TurnQueryBudgetTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('hero', password='password')
+        player = Player.objects.create(user=user, name='hero')
+        self.game_session = GameSession.objects.create(player=player)
+        GameState.objects.create(game_session=self.game_session)
+        StoryProgress.objects.create(game_session=self.game_session)
+        self.client.force_login(user)
+        # 로그인 후 첫 요청에서 한 번 채워지는 세션 인증 캐시는 미리 채움 (턴마다 반복되는 쿼리만 예산에 포함)
+        session_user_id(self.client.session)
+
+    def play_turn(self, message, budget):
+        with mock.patch('game.views.generate_demon_lord_turn', return_value=DEMON_LORD_TURN):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(f'/api/process-dialogue/{self.game_session.id}/', {'message': message})
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(queries), budget,
+            "Turn exceeded its query budget:\n" + "\n".join(query['sql'] for query in queries.captured_queries)
+        )
+        return response
+
+    def test_turn_stays_within_query_budget(self):
+        self.play_turn("평화를 위해 대화합시다.", TURN_QUERY_BUDGET)
+
+        self.assertEqual(Dialogue.objects.filter(game_session=self.game_session).count(), 2)
+        story_progress = StoryProgress.objects.get(game_session=self.game_session)
+        self.assertEqual(story_progress.current_chapter, 2)
+        self.assertEqual(story_progress.turn_count, 1)
+        self.assertEqual(story_progress.last_event_type, 'peace_proposal')
+        self.assertEqual([point['type'] for point in story_progress.plot_points], ['peace_proposal'])
+
+    def test_ending_turn_stays_within_query_budget(self):
+        GameState.objects.filter(game_session=self.game_session).update(player_persuasion_level=99)
+
+        response = self.play_turn("평화를 위해 대화합시다.", ENDING_TURN_QUERY_BUDGET)
+
+        self.assertIn('game_end', response.json())
+        self.assertEqual(GameResult.objects.get(game_session=self.game_session).total_turns, 1)
+
+    def test_ending_turn_keeps_existing_result(self):
+        # 결과가 이미 있어도 INSERT 실패는 savepoint 안에서만 되돌려지고 턴은 커밋됨
+        GameState.objects.filter(game_session=self.game_session).update(player_persuasion_level=99)
+        GameResult.objects.create(
+            game_session=self.game_session, result='시간 초과', final_persuasion_level=99,
+            final_demon_resistance=1, final_chapter=1, total_turns=0, duration=timedelta(minutes=1))
+
+        # INSERT 실패 시 ROLLBACK TO SAVEPOINT 1회가 더해짐
+        response = self.play_turn("평화를 위해 대화합시다.", ENDING_TURN_QUERY_BUDGET + 1)
+
+        self.assertIn('game_end', response.json())
+        self.assertEqual(Dialogue.objects.filter(game_session=self.game_session).count(), 2)
+        self.assertEqual(GameResult.objects.get(game_session=self.game_session).result, '시간 초과')
+
+    def test_turn_on_another_players_session_is_not_found(self):
+        self.client.force_login(User.objects.create_user('villain', password='password'))
+
+        response = self.client.post(f'/api/process-dialogue/{self.game_session.id}/', {'message': "항복하라"})
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Dialogue.objects.filter(game_session=self.game_session).exists())
+
+    def test_turn_requires_login(self):
+        self.client.logout()
+
+        response = self.client.post(f'/api/process-dialogue/{self.game_session.id}/', {'message': "항복하라"})
+
+        self.assertEqual(response.status_code, 302)
+
+    def test_streamed_turn_on_another_players_session_is_not_found(self):
+        self.client.force_login(User.objects.create_user('villain', password='password'))
+
+        response = self.client.post(f'/api/process-dialogue/{self.game_session.id}/stream/', {'message': "항복하라"})
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Dialogue.objects.filter(game_session=self.game_session).exists())
+
+    def test_turn_on_closed_session_is_rejected(self):
+        # 만료 처리가 먼저 세션을 닫았다면 턴은 아무것도 쓰지 않고 409
+        GameSession.objects.filter(pk=self.game_session.pk).update(is_active=False)
+
+        with mock.patch('game.views.generate_demon_lord_turn', return_value=DEMON_LORD_TURN):
+            response = self.client.post(f'/api/process-dialogue/{self.game_session.id}/', {'message': "평화"})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Dialogue.objects.filter(game_session=self.game_session).exists())
+        self.assertEqual(StoryProgress.objects.get(game_session=self.game_session).turn_count, 0)
+
+
+class ConversationSummaryCommitTests(TestCase):
+    # 밀려난 턴의 요약은 recent_messages를 저장한 턴이 커밋된 경우에만 실행
+    def setUp(self):
+        user = User.objects.create_user('hero', password='password')
+        game_session = GameSession.objects.create(player=Player.objects.create(user=user, name='hero'))
+        self.game_state = GameState.objects.create(game_session=game_session)
+        schedule_summary_update(self.game_state, [{'speaker': 'player', 'content': '안녕'}], mock.Mock())
+
+    def test_summary_runs_after_commit(self):
+        with mock.patch('game.conversation_memory._summary_executor.submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    apply_game_state_turn(self.game_state, 5)
+                    submit.assert_not_called()
+        submit.assert_called_once()
+
+    def test_stale_turn_discards_summary(self):
+        GameState.objects.filter(pk=self.game_state.pk).update(version=self.game_state.version + 1)
+        with mock.patch('game.conversation_memory._summary_executor.submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(StaleGameStateError):
+                    with transaction.atomic():
+                        apply_game_state_turn(self.game_state, 5)
+        submit.assert_not_called()
+
+
+def _baseline_analyze_dialogue_content(message, keywords, emotion_patterns):
+    # 사전 색인(Aho-Corasick) 도입 전 views.analyze_dialogue_content의 계산 (비교 기준)
+    score = 0
+    used_keywords = Counter()
+    emotions = Counter()
+    total_emotion_score = 0
+    for word, value in keywords.items():
+        count = message.count(word)
+        score += count * value
+        if count > 0:
+            used_keywords[word] = count
+    for pattern, (emotion, value) in emotion_patterns.items():
+        matches = re.findall(pattern, message)
+        if matches:
+            emotions[emotion] += len(matches)
+            total_emotion_score += value * len(matches)
+    main_topics = [word for word, count in used_keywords.most_common(3)]
+    sentence_count = len(re.findall(r'\w+[.!?]', message))
+    complexity = len(message.split()) / max(sentence_count, 1)
+    return {
+        'score': score,
+        'used_keywords': dict(used_keywords),
+        'emotions': dict(emotions),
+        'emotion_score': total_emotion_score,
+        'main_topics': main_topics,
+        'length': len(message),
+        'complexity': complexity,
+        'dominant_emotion': emotions.most_common(1)[0][0] if emotions else None
+    }
+
+
+class DialogueAnalyzerTests(SimpleTestCase):
+    # 사전 색인으로 바꾼 분석 결과는 키 구성과 값 모두 이전 계산과 같아야 함
+    MESSAGES = [
+        "",
+        "평화와 협력을 위해 대화합시다. 마왕이여, 이해해 주시오!",
+        "평화평화평화 뿡뿡 세계의 운명",
+        "기쁘고 즐겁고 행복하다. 하지만 슬프고 우울해.",
+        "정말기쁘다 너무기뻐 기쁘기쁘",
+        "화나! 짜증나? 분노한다. 두렵고 무서워",
+        "감사합니다 고마워요 놀라워 깜짝이야 기대와 희망",
+        "위협과 공격, 파괴를 멈추시오. 동맹 대결",
+        "_기쁘 1기쁘 a즐겁 (기쁘) 기대기대희망",
+    ]
+
+    def test_matches_baseline_analysis(self):
+        with open(get_lexicon_store().path, encoding='utf-8') as f:
+            data = json.load(f)
+        emotion_patterns = {item['pattern']: (item['emotion'], item['value']) for item in data['emotion_patterns']}
+
+        for message in self.MESSAGES:
+            with self.subTest(message=message):
+                self.assertEqual(
+                    get_lexicon().analyze(message),
+                    _baseline_analyze_dialogue_content(message, data['keywords'], emotion_patterns))
+
+
+class StoryBranchTests(TestCase):
+    # 분기 단어는 점수 키워드가 아니어도 같은 사전 색인으로 찾아야 함
+    def setUp(self):
+        user = User.objects.create_user('hero', password='password')
+        game_session = GameSession.objects.create(player=Player.objects.create(user=user, name='hero'))
+        self.game_state = GameState.objects.create(game_session=game_session)
+        self.story_progress = StoryProgress.objects.create(game_session=game_session, current_chapter=2)
+
+    def test_alliance_term_selects_alliance_path(self):
+        message = "우리 동맹을 맺읍시다"
+        self.assertEqual(get_lexicon().branches(message), {'alliance'})
+
+        result = update_story_progress(
+            self.story_progress, self.game_state, get_lexicon().analyze(message), "그 제안을 이해한다", message)
+
+        self.assertEqual(result['story_path'], 'alliance')
+
+    def test_confrontation_term_selects_confrontation_path(self):
+        message = "정정당당하게 대결하자"
+
+        result = update_story_progress(
+            self.story_progress, self.game_state, get_lexicon().analyze(message), "어리석은 인간이여", message)
+
+        self.assertEqual(result['story_path'], 'confrontation')
+
+
+class RescoreDialoguesTests(TestCase):
+    # purge 후에도 보관본의 대화가 재채점 대상에 포함되고, purge 전에는 두 번 세지 않아야 함
+    def setUp(self):
+        user = User.objects.create_user('hero', password='password')
+        self.archived = GameSession.objects.create(player=Player.objects.create(user=user, name='hero'))
+        for content in ("용기를 내자", "동맹을 맺자"):
+            Dialogue.objects.create(game_session=self.archived, speaker='player', content=content)
+        Dialogue.objects.create(game_session=self.archived, speaker='npc', content="좋다")
+        GameResult.objects.create(
+            game_session=self.archived, result='승리', final_persuasion_level=100,
+            final_demon_resistance=0, final_chapter=3, total_turns=2, duration=timedelta(minutes=5))
+        archive_session(self.archived.id)
+
+        other = User.objects.create_user('other', password='password')
+        self.live = GameSession.objects.create(player=Player.objects.create(user=other, name='other'))
+        Dialogue.objects.create(game_session=self.live, speaker='player', content="싸우자")
+
+    def rescore(self, **options):
+        out = StringIO()
+        call_command('rescore_dialogues', stdout=out, **options)
+        return out.getvalue()
+
+    def test_archived_dialogues_counted_once_before_purge(self):
+        self.assertIn("재채점 완료: 4개", self.rescore())
+
+    def test_archived_dialogues_rescored_after_purge(self):
+        purge_archived_dialogues()
+        self.assertFalse(Dialogue.objects.filter(game_session=self.archived).exists())
+
+        self.assertIn("재채점 완료: 4개", self.rescore())
+        self.assertIn("재채점 완료: 2개", self.rescore(speaker='player', session=self.archived.id))
+
+
+class ArchivedTranscriptTests(TestCase):
+    # 보관된 기록은 페이지를 넘길 때마다 압축을 다시 풀지 않아야 함
+    def setUp(self):
+        user = User.objects.create_user('hero', password='password')
+        self.game_session = GameSession.objects.create(player=Player.objects.create(user=user, name='hero'))
+        for content in ("하나", "둘", "셋"):
+            Dialogue.objects.create(game_session=self.game_session, speaker='영웅', content=content)
+        GameResult.objects.create(
+            game_session=self.game_session, result='승리', final_persuasion_level=100,
+            final_demon_resistance=0, final_chapter=3, total_turns=3, duration=timedelta(minutes=5))
+        archive_session(self.game_session.id)
+        purge_archived_dialogues()
+        self.archived_at = GameResult.objects.get(game_session=self.game_session).archived_at
+
+    def test_pages_unpack_the_archive_once(self):
+        contents, cursor = [], None
+        with mock.patch('game.transcripts.unpack_transcript', wraps=unpack_transcript) as unpack:
+            while True:
+                dialogues, cursor = transcript_page(self.game_session.id, cursor, 1, archived_at=self.archived_at)
+                contents += [dialogue.content for dialogue in dialogues]
+                if cursor is None:
+                    break
+
+        self.assertEqual(contents, ["하나", "둘", "셋"])
+        self.assertEqual(unpack.call_count, 1)
+
+class SessionAuthTests(TestCase):
+    # 캐시된 스냅샷으로 응답하는 뷰도 비밀번호 변경/비활성화된 사용자의 세션은 거부해야 함
+    def setUp(self):
+        self.user = User.objects.create_user('hero', password='password')
+        game_session = GameSession.objects.create(player=Player.objects.create(user=self.user, name='hero'))
+        GameState.objects.create(game_session=game_session)
+        StoryProgress.objects.create(game_session=game_session)
+        self.url = reverse('game:api_get_game_state', args=[game_session.id])
+        self.client.force_login(self.user)
+
+    def test_valid_session_reads_state(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_password_change_logs_out_other_sessions(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('changed')
+            self.user.save()
+
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_inactive_user_is_rejected(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+            self.user.refresh_from_db()
+            self.user.save(update_fields=['is_active'])
+
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+
+class GameResultPageTests(TestCase):
+    # 결과 페이지는 캐시되지만 권한 확인은 캐시보다 먼저, 보관/삭제 시에는 캐시를 버려야 함
+    def setUp(self):
+        caches['game_results'].clear()
+        self.user = User.objects.create_user('hero', password='password')
+        player = Player.objects.create(user=self.user, name='hero')
+        self.game_session = GameSession.objects.create(player=player, is_completed=True, end_time=timezone.now())
+        GameState.objects.create(game_session=self.game_session)
+        StoryProgress.objects.create(game_session=self.game_session)
+        Dialogue.objects.create(game_session=self.game_session, speaker='영웅', content="평화를 원한다")
+        GameResult.objects.create(
+            game_session=self.game_session, result='승리', final_persuasion_level=100,
+            final_demon_resistance=0, final_chapter=3, total_turns=1, duration=timedelta(minutes=5))
+        self.url = reverse('game:game_result', args=[self.game_session.id])
+        self.client.force_login(self.user)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 32
+
+    def test_owner_is_checked_before_the_cached_page(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        self.client.force_login(User.objects.create_user('villain', password='password'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_unfinished_game_is_forbidden(self):
+        GameSession.objects.filter(pk=self.game_session.pk).update(is_completed=False)
+
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_revalidation_returns_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['Cache-Control'], 'private, max-age=0, must-revalidate')
+
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': response['ETag']}).status_code, 304)
+        self.assertEqual(
+            self.client.get(self.url, headers={'If-Modified-Since': response['Last-Modified']}).status_code, 304)
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': '"stale"'}).status_code, 200)
+
+    def test_archiving_refreshes_the_cached_page(self):
+        self.assertContains(self.client.get(self.url), "평화를 원한다")
+        Dialogue.objects.filter(game_session=self.game_session).update(content="동맹을 맺자")
+        self.assertContains(self.client.get(self.url), "평화를 원한다")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_session(self.game_session.id)
+
+        self.assertContains(self.client.get(self.url), "동맹을 맺자")
+
+    def test_deleting_the_session_drops_the_cached_page(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.game_session.delete()
+
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+def _api_error(status_code):
+    response = httpx.Response(status_code, request=httpx.Request('POST', 'https://api.openai.com/v1/chat/completions'))
+    return openai.APIStatusError("error", response=response, body=None)
+
+
+@mock.patch('game.llm_transport.time.monotonic')
+class CircuitBreakerTests(SimpleTestCase):
+    # closed -> (연속 실패) open -> (복구 대기 후) half-open 탐색 -> 성공 시 closed / 실패 시 다시 open
+    def setUp(self):
+        self.breaker = CircuitBreaker(2, 30, 1, TransportMetrics())
+
+    def open_breaker(self, monotonic):
+        monotonic.return_value = 100
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_opens_after_threshold_and_short_circuits(self, monotonic):
+        monotonic.return_value = 100
+        self.breaker.record_failure()
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+        self.breaker.record_failure()
+        monotonic.return_value = 129
+        with self.assertRaises(LLMCircuitOpenError):
+            self.breaker.before_call()
+
+    def test_half_open_probe_success_closes(self, monotonic):
+        self.open_breaker(monotonic)
+        monotonic.return_value = 131
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(LLMCircuitOpenError):
+            self.breaker.before_call()
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.before_call()
+
+    def test_half_open_probe_failure_reopens(self, monotonic):
+        self.open_breaker(monotonic)
+        monotonic.return_value = 131
+        self.breaker.before_call()
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(LLMCircuitOpenError):
+            self.breaker.before_call()
+
+    def test_cancelled_probe_frees_the_slot(self, monotonic):
+        self.open_breaker(monotonic)
+        monotonic.return_value = 131
+        self.breaker.before_call()
+
+        self.breaker.cancel_probe()
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+
+
+class LLMTransportBreakerTests(SimpleTestCase):
+    # 공급자 장애(5xx/연결 오류)만 차단기에 반영하고, 요청 오류와 취소는 탐색 슬롯만 돌려줌
+    def setUp(self):
+        self.transport = LLMTransport(BREAKER_FAILURE_THRESHOLD=1, HEDGE_AFTER=None)
+
+    def half_open(self):
+        self.transport.breaker.record_failure()
+        self.transport.breaker._opened_at -= self.transport.options['BREAKER_RECOVERY_TIMEOUT']
+
+    def test_server_errors_open_and_client_errors_do_not(self):
+        with mock.patch.object(self.transport, '_create', side_effect=_api_error(400)):
+            with self.assertRaises(openai.APIStatusError):
+                self.transport.chat_completion(model='m', messages=[])
+        self.assertEqual(self.transport.breaker.state, CircuitBreaker.CLOSED)
+
+        with mock.patch.object(self.transport, '_create', side_effect=_api_error(503)):
+            with self.assertRaises(openai.APIStatusError):
+                self.transport.chat_completion(model='m', messages=[])
+        self.assertEqual(self.transport.breaker.state, CircuitBreaker.OPEN)
+
+    def test_cancelled_probe_does_not_wedge_the_breaker(self):
+        self.half_open()
+
+        async def never_answers(kwargs, deadline_at):
+            await asyncio.Event().wait()
+
+        async def cancel_probe_call():
+            with mock.patch.object(self.transport, '_ahedged_call', never_answers):
+                task = asyncio.ensure_future(self.transport.achat_completion(model='m', messages=[]))
+                await asyncio.sleep(0)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+
+        asyncio.run(cancel_probe_call())
+
+        self.assertEqual(self.transport.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.transport.breaker.before_call()
+
+
+class ConcurrencyLimiterTests(SimpleTestCase):
+    # 슬롯을 넘겨받을 대기자의 이벤트 루프가 이미 닫혔으면 슬롯이 사라지지 않고 다음 대기자/반납으로 이어져야 함
+    def test_release_skips_waiter_on_closed_loop(self):
+        limiter = ConcurrencyLimiter(1, 10, TransportMetrics())
+        limiter.acquire(timeout=1)
+        loop = asyncio.new_event_loop()
+        dead_waiter = _Waiter(loop=loop, future=loop.create_future())
+        loop.close()
+        limiter._waiters.append(dead_waiter)
+
+        limiter.release()
+
+        self.assertEqual((limiter.in_flight, limiter.queued), (0, 0))
+        self.assertTrue(limiter.try_acquire())
+
+
+LOCAL_ANALYSIS = {'persuasion_strength': 7, 'emotional_impact': '긍정적', 'primary_approach': '설득'}
+
+
+@override_settings(PLAYER_ANALYSIS_BACKEND='local')
+class LocalPlayerAnalysisTests(SimpleTestCase):
+    # 로컬 분석기를 쓰면 LLM에는 응답만 요청하고 분석은 배치 분석기 결과를 사용
+    def local_classifier(self):
+        classifier = mock.Mock()
+        future = Future()
+        future.set_result(dict(LOCAL_ANALYSIS))
+        classifier.submit.return_value = future
+
+        async def aclassify(message):
+            return dict(LOCAL_ANALYSIS)
+
+        classifier.aclassify = aclassify
+        return classifier
+
+    def test_turn_requests_reply_only(self):
+        with mock.patch('game.chatbot.get_classifier', return_value=self.local_classifier()), \
+                mock.patch('game.chatbot.generate_demon_lord_response', return_value=DEMON_LORD_TURN[:2]) as reply:
+            turn = generate_demon_lord_turn("평화를 원한다", GameState(), 1)
+
+        self.assertEqual(turn, (*DEMON_LORD_TURN[:2], LOCAL_ANALYSIS))
+        reply.assert_called_once()
+
+    def test_async_turn_requests_reply_only(self):
+        async def reply(*args):
+            return DEMON_LORD_TURN[:2]
+
+        async def classifier():
+            return self.local_classifier()
+
+        with mock.patch('game.chatbot.aget_classifier', classifier), \
+                mock.patch('game.chatbot.agenerate_demon_lord_response', reply):
+            turn = asyncio.run(agenerate_demon_lord_turn("평화를 원한다", GameState(), 1))
+
+        self.assertEqual(turn, (*DEMON_LORD_TURN[:2], LOCAL_ANALYSIS))
+
+    def test_failed_model_load_is_not_retried(self):
+        with mock.patch.multiple('game.local_classifier', _classifier=None, _classifier_error=None), \
+                mock.patch('game.local_classifier.LocalMessageClassifier', side_effect=ImportError) as load:
+            for _ in range(3):
+                self.assertEqual(analyze_player_message("평화를 원한다"), DEFAULT_PLAYER_ANALYSIS)
+
+        self.assertEqual(load.call_count, 1)
+
+@override_settings(DEBUG=False, ALLOWED_HOSTS=['.example.com'], CSRF_TRUSTED_ORIGINS=['http://localhost:5173'])
+class WebSocketOriginTests(SimpleTestCase):
+    # 브라우저가 보낸 Origin이 허용된 호스트가 아니면 WebSocket 연결을 받지 않음
+    def scope(self, origin=None):
+        return {'headers': [(b'origin', origin.encode())] if origin else []}
+
+    def test_allowed_origins(self):
+        self.assertTrue(_origin_allowed(self.scope('https://play.example.com')))
+        self.assertTrue(_origin_allowed(self.scope('http://localhost:5173')))
+
+    def test_other_origins_are_rejected(self):
+        self.assertFalse(_origin_allowed(self.scope('https://evil.test')))
+        self.assertFalse(_origin_allowed(self.scope('http://localhost:8000')))
+        self.assertFalse(_origin_allowed(self.scope('null')))
+        self.assertFalse(_origin_allowed(self.scope()))
+
+    @override_settings(DEBUG=True, ALLOWED_HOSTS=[])
+    def test_debug_allows_localhost(self):
+        self.assertTrue(_origin_allowed(self.scope('http://localhost:8000')))
+        self.assertTrue(_origin_allowed(self.scope('http://[::1]:8000')))
+        self.assertFalse(_origin_allowed(self.scope('https://evil.test')))
+
+
+class LocalBrokerHistoryTests(SimpleTestCase):
+    # 최근 이벤트 기록은 HISTORY_TOPICS개 세션까지만 보관 (가장 오래 발행이 없던 세션부터 버림)
+    def test_history_keeps_most_recently_published_topics(self):
+        broker = LocalBroker({**DEFAULT_EVENT_SETTINGS, 'HISTORY_TOPICS': 2})
+        broker.publish('a', 'turn', {})
+        broker.publish('b', 'turn', {})
+        broker.publish('a', 'state', {})
+        broker.publish('c', 'turn', {})
+
+        self.assertEqual([event['type'] for event in broker.recent('a')], ['turn', 'state'])
+        self.assertEqual(broker.recent('b'), [])
+        self.assertEqual(len(broker.recent('c')), 1)
+
+
+REPLICA_ROUTING = {
+    'PRIMARY': 'default',
+    'REPLICAS': {'default': ['replica']},
+    'SHARDS': [],
+    'STICKY_SECONDS': 5,
+    'STICKY_CACHE_ALIAS': 'default',
+}
+SHARD_ROUTING = {**REPLICA_ROUTING, 'REPLICAS': {}, 'SHARDS': ['shard0', 'shard1']}
+
+
+class GameDatabaseRouterTests(SimpleTestCase):
+    # default + replica 또는 default + shard0 + shard1 구성을 기준으로 라우팅 결정만 확인
+    def tearDown(self):
+        activate_for_user(None)
+
+    def test_reads_use_replica_until_the_request_writes(self):
+        router = GameDatabaseRouter(REPLICA_ROUTING)
+        activate_for_user('1')
+
+        self.assertEqual(router.db_for_read(GameState), 'replica')
+        self.assertEqual(router.db_for_read(User), 'default')
+        self.assertEqual(router.db_for_write(GameState), 'default')
+        self.assertEqual(router.db_for_read(GameState), 'default')
+
+    def test_write_through_replica_instance_goes_to_primary(self):
+        router = GameDatabaseRouter(REPLICA_ROUTING)
+        game_state = GameState()
+        game_state._state.db = 'replica'
+
+        self.assertEqual(router.db_for_write(GameState, instance=game_state), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'game'))
+
+    @override_settings(GAME_DATABASE_ROUTING=REPLICA_ROUTING)
+    def test_user_is_pinned_to_primary_after_a_write(self):
+        router = GameDatabaseRouter(REPLICA_ROUTING)
+        activate_for_user('7')
+        router.db_for_write(Dialogue)
+        request_finished.send(sender=self.__class__)
+
+        self.assertTrue(is_pinned_to_primary('7'))
+        self.assertFalse(is_pinned_to_primary('8'))
+        activate_for_user('7', pinned=True)
+        self.assertEqual(router.db_for_read(Dialogue), 'default')
+
+    def test_game_models_follow_the_players_shard(self):
+        router = GameDatabaseRouter(SHARD_ROUTING)
+        shards = {shard_for_user(user_id, SHARD_ROUTING) for user_id in range(1, 50)}
+        self.assertEqual(shards, {'shard0', 'shard1'})
+
+        for user_id in range(1, 10):
+            shard = shard_for_user(user_id, SHARD_ROUTING)
+            self.assertEqual(shard, shard_for_user(str(user_id), SHARD_ROUTING))
+            with use_shard(shard):
+                self.assertEqual(router.db_for_read(GameSession), shard)
+                self.assertEqual(router.db_for_write(PlotEvent), shard)
+                self.assertEqual(router.db_for_write(User), 'default')
+
+    def test_sharded_models_require_a_shard(self):
+        router = GameDatabaseRouter(SHARD_ROUTING)
+        with self.assertRaises(ShardNotSelectedError):
+            router.db_for_read(GameSession)
+
+    def test_request_without_a_shard_is_sent_to_login(self):
+        # 비로그인 요청이 game 모델에 닿아도 500이 아니라 로그인 페이지로
+        request = RequestFactory().get('/result/1/')
+        request.session = {}
+        middleware = database_routing_middleware(lambda request: HttpResponse())
+
+        response = middleware.process_exception(request, ShardNotSelectedError())
+
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNone(middleware.process_exception(request, ValueError()))
+
+    def test_sticky_pin_needs_a_shared_cache(self):
+        with override_settings(GAME_DATABASE_ROUTING=REPLICA_ROUTING):
+            self.assertEqual([warning.id for warning in check_sticky_cache()], ['game.W001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://'}}
+        with override_settings(GAME_DATABASE_ROUTING=REPLICA_ROUTING, CACHES=shared):
+            self.assertEqual(check_sticky_cache(), [])
+        with override_settings(GAME_DATABASE_ROUTING={**REPLICA_ROUTING, 'REPLICAS': {}}):
+            self.assertEqual(check_sticky_cache(), [])
+
+    def test_migrations_per_database(self):
+        router = GameDatabaseRouter(SHARD_ROUTING)
+        self.assertTrue(router.allow_migrate('shard1', 'game'))
+        self.assertTrue(router.allow_migrate('shard1', 'auth'))
+        self.assertFalse(router.allow_migrate('default', 'game'))
+        self.assertTrue(router.allow_migrate('default', 'auth'))
+        self.assertFalse(router.allow_migrate('other', 'game'))
+        self.assertIsNone(GameDatabaseRouter(REPLICA_ROUTING).allow_migrate('default', 'game'))
+
+    def test_relations_across_shards_are_rejected(self):
+        router = GameDatabaseRouter(SHARD_ROUTING)
+        game_session, dialogue, user = GameSession(), Dialogue(), User()
+        game_session._state.db, dialogue._state.db, user._state.db = 'shard1', 'shard0', 'default'
+
+        self.assertFalse(router.allow_relation(game_session, dialogue))
+        self.assertTrue(router.allow_relation(game_session, user))
+
+
+# 실제 샤드 DB로 확인하는 테스트는 DATABASES에 shard0, shard1을 추가한 설정에서만 실행
+HAS_SHARD_DATABASES = set(SHARD_ROUTING['SHARDS']) <= set(settings.DATABASES)
+
+
+@skipUnless(HAS_SHARD_DATABASES, "DATABASES에 shard0, shard1이 있어야 실행")
+@override_settings(GAME_DATABASE_ROUTING=SHARD_ROUTING)
+class ShardedUserDeletionTests(TestCase):
+    # 사용자를 지우면 primary의 User와 함께 그 사용자 샤드의 Player/게임 기록도 지워져야 함
+    databases = {'default', *SHARD_ROUTING['SHARDS']} if HAS_SHARD_DATABASES else {'default'}
+
+    def setUp(self):
+        patcher = mock.patch.object(router.routers[0], 'options', SHARD_ROUTING)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_player(self, username):
+        user = User.objects.create_user(username, password='password')
+        shard = shard_for_user(user.pk)
+        with use_shard(shard):
+            game_session = GameSession.objects.create(player=Player.objects.create(user=user, name=username))
+            Dialogue.objects.create(game_session=game_session, speaker='player', content='안녕')
+        return user, shard
+
+    def test_deleting_user_removes_player_on_its_shard(self):
+        users = [self.create_player(f'hero{i}') for i in range(8)]
+        self.assertEqual({shard for _, shard in users}, {'shard0', 'shard1'})
+        (user, shard), (other, other_shard) = users[0], users[1]
+
+        user.delete()
+
+        self.assertFalse(User.objects.filter(pk=user.pk).exists())
+        self.assertFalse(Player.objects.using(shard).filter(user_id=user.pk).exists())
+        self.assertFalse(GameSession.objects.using(shard).filter(player__user_id=user.pk).exists())
+        self.assertFalse(Dialogue.objects.using(shard).filter(game_session__player__user_id=user.pk).exists())
+        self.assertTrue(Player.objects.using(other_shard).filter(user_id=other.pk).exists())
+        self.assertFalse(Player.objects.using('default').exists())
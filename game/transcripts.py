@@ -0,0 +1,202 @@
+# game/transcripts.py
+import base64
+import binascii
+import json
+import logging
+import threading
+import zlib
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .db_router import game_db, shard_cache_prefix
+from .models import Dialogue, GameResult, GameSession
+from .result_cache import invalidate_result_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 30
+DEFAULT_DELETE_BATCH_SIZE = 1000
+# 프로세스 안에 풀어 둘 보관본 수 (결과 페이지/transcript API가 페이지마다 압축을 풀지 않도록)
+DEFAULT_UNPACKED_ARCHIVE_CACHE_SIZE = 64
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(dialogue):
+    # 마지막으로 보낸 대화의 (timestamp, id)를 불투명한 문자열로
+    raw = f"{dialogue.timestamp.isoformat()}|{dialogue.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, dialogue_id = raw.rsplit('|', 1)
+        parsed = parse_datetime(timestamp)
+        if parsed is None:
+            raise ValueError(timestamp)
+        return parsed, int(dialogue_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor(f"Invalid transcript cursor: {cursor!r}") from e
+
+
+def pack_transcript(dialogues):
+    # dialogues: timestamp, id 순으로 정렬된 {'id', 'timestamp', 'speaker', 'content'} 목록 -> 압축된 blob
+    payload = {
+        'version': 1,
+        'dialogues': [
+            [dialogue['id'], dialogue['timestamp'].isoformat(), dialogue['speaker'], dialogue['content']]
+            for dialogue in dialogues
+        ],
+    }
+    return zlib.compress(json.dumps(payload, ensure_ascii=False).encode('utf-8'), 9)
+
+
+def unpack_transcript(blob):
+    # 보관된 blob을 저장되지 않은 Dialogue 객체 목록으로 복원 (템플릿/API에서 기존과 같은 방식으로 사용)
+    payload = json.loads(zlib.decompress(bytes(blob)).decode('utf-8'))
+    return [
+        Dialogue(id=dialogue_id, timestamp=parse_datetime(timestamp), speaker=speaker, content=content)
+        for dialogue_id, timestamp, speaker, content in payload['dialogues']
+    ]
+
+
+_unpacked_archives = OrderedDict()
+_unpacked_archives_lock = threading.Lock()
+
+
+def _unpacked_archive(game_session_id, archived_at):
+    """
+    보관된 대화 기록을 풀어 (대화 목록, (timestamp, id) 키 목록)으로 반환.
+    보관본은 한 번 저장되면 바뀌지 않으므로 (샤드, 세션, 보관 시각)별로 최근 것만 LRU로 유지하고,
+    없을 때만 blob을 읽어 압축을 품.
+    """
+    key = (shard_cache_prefix(), game_session_id, archived_at)
+    with _unpacked_archives_lock:
+        entry = _unpacked_archives.get(key)
+        if entry is not None:
+            _unpacked_archives.move_to_end(key)
+            return entry
+
+    blob = GameResult.objects.filter(game_session_id=game_session_id).values_list(
+        'transcript_archive', flat=True).first()
+    dialogues = unpack_transcript(blob) if blob else []
+    entry = (dialogues, [(dialogue.timestamp, dialogue.id) for dialogue in dialogues])
+
+    size = getattr(settings, 'TRANSCRIPT_UNPACKED_ARCHIVE_CACHE_SIZE', DEFAULT_UNPACKED_ARCHIVE_CACHE_SIZE)
+    with _unpacked_archives_lock:
+        _unpacked_archives[key] = entry
+        _unpacked_archives.move_to_end(key)
+        while len(_unpacked_archives) > size:
+            _unpacked_archives.popitem(last=False)
+    return entry
+
+
+def _archived_page(game_session_id, archived_at, cursor, limit):
+    dialogues, keys = _unpacked_archive(game_session_id, archived_at)
+    start = bisect_right(keys, decode_cursor(cursor)) if cursor else 0
+    return dialogues[start:start + limit + 1]
+
+
+def transcript_page(game_session_id, cursor=None, limit=DEFAULT_PAGE_SIZE, archived_at=None):
+    """
+    (game_session, timestamp, id) 복합 인덱스를 따라가는 keyset 페이지네이션.
+    OFFSET/COUNT 없이 cursor 다음 limit개만 읽으므로 몇 번째 페이지든 비용이 같음.
+    archived_at(GameResult.archived_at)이 있으면 보관된 기록에서 같은 방식으로 읽음.
+    (대화 목록, 다음 페이지 cursor 또는 None)을 반환.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if archived_at:
+        dialogues = _archived_page(game_session_id, archived_at, cursor, limit)
+    else:
+        queryset = Dialogue.objects.filter(game_session_id=game_session_id).order_by('timestamp', 'id')
+        if cursor:
+            timestamp, dialogue_id = decode_cursor(cursor)
+            # timestamp__gte로 인덱스 탐색 시작점을 잡고, 같은 시각인 행은 id로 구분
+            queryset = queryset.filter(timestamp__gte=timestamp).filter(
+                Q(timestamp__gt=timestamp) | Q(id__gt=dialogue_id)
+            )
+        dialogues = list(queryset.only('id', 'timestamp', 'speaker', 'content')[:limit + 1])
+
+    has_more = len(dialogues) > limit
+    dialogues = dialogues[:limit]
+    return dialogues, (encode_cursor(dialogues[-1]) if has_more else None)
+
+
+def archive_age():
+    return timedelta(days=getattr(settings, 'TRANSCRIPT_ARCHIVE_AFTER_DAYS', DEFAULT_ARCHIVE_AFTER_DAYS))
+
+
+def archive_session(game_session_id, now=None):
+    # 세션의 대화 기록 전체를 하나의 압축 blob으로 GameResult에 저장 (행 삭제는 purge_archived_dialogues에서)
+    using = game_db()
+    with transaction.atomic(using=using):
+        game_result = GameResult.objects.select_for_update().filter(
+            game_session_id=game_session_id, archived_at__isnull=True).only('id').first()
+        if game_result is None:
+            return False
+        dialogues = Dialogue.objects.filter(game_session_id=game_session_id).order_by('timestamp', 'id').values(
+            'id', 'timestamp', 'speaker', 'content')
+        GameResult.objects.filter(pk=game_result.pk).update(
+            transcript_archive=pack_transcript(dialogues),
+            archived_at=now or timezone.now(),
+        )
+        transaction.on_commit(lambda: invalidate_result_cache([game_session_id]), using=using)
+    return True
+
+
+def purge_archived_dialogues(batch_size=DEFAULT_DELETE_BATCH_SIZE):
+    # 보관이 끝난 세션의 Dialogue 행을 batch_size개씩 삭제 (중간에 멈춰도 다음 실행에서 이어서 삭제)
+    deleted = 0
+    while True:
+        with transaction.atomic(using=game_db()):
+            ids = list(
+                Dialogue.objects.filter(game_session__game_result__archived_at__isnull=False)
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            deleted += Dialogue.objects.filter(id__in=ids).delete()[0]
+    return deleted
+
+
+def archive_completed_sessions(older_than=None, batch_size=DEFAULT_DELETE_BATCH_SIZE, now=None):
+    """
+    완료된 지 older_than(기본: TRANSCRIPT_ARCHIVE_AFTER_DAYS)이 지난 세션의 대화 기록을 보관하고 행을 삭제.
+    (보관한 세션 수, 삭제한 Dialogue 행 수)를 반환.
+    """
+    now = now or timezone.now()
+    cutoff = now - (older_than if older_than is not None else archive_age())
+    candidates = GameSession.objects.filter(
+        is_completed=True,
+        end_time__lt=cutoff,
+        game_result__isnull=False,
+        game_result__archived_at__isnull=True,
+    ).order_by('id').values_list('id', flat=True)
+
+    archived = 0
+    last_id = 0
+    while True:
+        session_ids = list(candidates.filter(id__gt=last_id)[:batch_size])
+        if not session_ids:
+            break
+        for game_session_id in session_ids:
+            archived += archive_session(game_session_id, now)
+        last_id = session_ids[-1]
+
+    deleted = purge_archived_dialogues(batch_size)
+    if archived or deleted:
+        logger.info(f"대화 기록 보관 완료: 세션 {archived}개, 삭제한 대화 {deleted}개")
+    return archived, deleted
@@ -22,7 +22,14 @@ urlpatterns = [
     # 새로운 API 엔드포인트 추가
     path('api/start-game/', views.start_game, name='api_start_game'),
     path('api/process-dialogue/<int:game_session_id>/', views.process_dialogue, name='process_dialogue'),
+    path('api/async/process-dialogue/<int:game_session_id>/', views.aprocess_dialogue, name='aprocess_dialogue'),
+    path('api/process-dialogue/<int:game_session_id>/stream/', views.process_dialogue_stream,
+         name='process_dialogue_stream'),
     path('api/game-state/<int:game_session_id>/', views.api_get_game_state, name='api_get_game_state'),
+    path('api/transcript/<int:game_session_id>/', views.api_transcript, name='api_transcript'),
+    # 게임 이벤트 long-poll (WebSocket은 TRPG_Hero/asgi.py의 ws/game/<id>/)
+    path('api/game-events/<int:game_session_id>/', views.api_game_events, name='api_game_events'),
+    path('api/db-pool-metrics/', views.api_db_pool_metrics, name='api_db_pool_metrics'),
 
     path('api/get-csrf-token/', views.get_csrf_token, name='get_csrf_token'),
     path('api/set-csrf-token/', views.set_csrf_token, name='set_csrf_token'),
@@ -1,24 +1,40 @@
+import asyncio
 import logging
 from typing import Optional, Callable, Tuple, Dict
 
 from django.core.exceptions import ValidationError
-from django.db import transaction, connection
+from django.db import IntegrityError, transaction, connections, close_old_connections
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.http import HttpResponseForbidden, HttpResponse
+from django.contrib.messages import get_messages
+from django.http import HttpResponseForbidden, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_protect, ensure_csrf_cookie, csrf_exempt
 from django.views.decorators.http import require_POST, require_http_methods, require_GET
-from django.http import HttpResponseBadRequest
-from .chatbot import generate_demon_lord_response, analyze_player_message
+from django.http import Http404, HttpResponseBadRequest
+from django.utils.http import http_date, parse_http_date_safe
+from asgiref.sync import sync_to_async
+
+from .chatbot import generate_demon_lord_response, generate_demon_lord_turn, agenerate_demon_lord_turn, \
+    astream_demon_lord_response, finalize_demon_lord_response, analyze_player_message
 from .models import Player, GameSession, Dialogue, GameState, StoryProgress, GameResult
 from django.utils import timezone
 from django.contrib.auth import logout
 from django.http import JsonResponse
+from .lexicon import get_lexicon
+from .db_pool import all_pool_metrics
+from .db_router import game_db
+from .session_expiry import TIMEOUT_RESULT, is_session_expired
+from .session_auth import asession_user_id, session_user_id
+from .state_snapshot import build_snapshot, get_snapshot, store_snapshot
+from .result_cache import get_cached_page, get_result_meta, store_page
+from .event_broker import get_event_settings, publish_turn_events, recent_game_events, subscribe_game_events
+from .transcripts import DEFAULT_PAGE_SIZE, InvalidCursor, transcript_page
 from .game_logic import update_emotional_state, update_demon_lord_emotion, calculate_argument_strength, \
-    update_environmental_factors, update_game_state, update_story_progress
+    update_environmental_factors, update_game_state, update_story_progress, StaleGameStateError, \
+    GameSessionClosedError, TurnUnitOfWork
 import json
 import openai
 from django.conf import settings
@@ -50,6 +66,9 @@ def logout_view(request):
 
 logger = logging.getLogger(__name__)
 
+# 이 턴 수를 넘기면 '대화 턴 초과'로 게임 종료
+MAX_DIALOGUE_TURNS = 25
+
 
 @csrf_exempt
 @login_required
@@ -117,7 +136,7 @@ def play_game(request, game_session_id):
             return JsonResponse({"error": "No message provided"}, status=400)
 
         try:
-            with transaction.atomic():
+            with transaction.atomic(using=game_db()):
                 # 플레이어 메시지 분석
                 analysis_result = analyze_player_message(message)
 
@@ -163,88 +182,38 @@ def play_game(request, game_session_id):
         return render(request, 'game/play.html', context)
 
 
-import re
-from collections import Counter
+def analyze_dialogue_content(message):
+    # 키워드/감정 사전(game/data/lexicon.json)은 로드 시 한 번 컴파일되고, 메시지는 한 번만 훑음
+    return get_lexicon().analyze(message)
 
 
-def analyze_dialogue_content(message):
-    # 키워드 목록 (예시)
-    keywords = {
-        '평화': 5,
-        '협력': 5,
-        '이해': 4,
-        '대화': 4,
-        '설득': 3,
-        '동의': 3,
-        '타협': 3,
-        '위협': -2,
-        '공격': -3,
-        '파괴': -4,
-        '마왕': 2,
-        '영웅': 2,
-        '세계': 1,
-        '운명': 1,
-        '뿡': 50
-    }
+def _release_db_connection():
+    # LLM 응답을 기다리는 동안 DB 연결을 붙잡지 않도록 반납 (트랜잭션 밖일 때만, CONN_MAX_AGE 설정을 따름)
+    if not connections[game_db()].in_atomic_block:
+        close_old_connections()
 
-    # 감정 표현 패턴 (예시)
-    emotion_patterns = {
-        r'\b기쁘|즐겁|행복': ('positive', 3),
-        r'\b슬프|우울|속상': ('negative', -2),
-        r'\b화나|짜증|분노': ('angry', -3),
-        r'\b두렵|무서': ('fear', -2),
-        r'\b감사|고마': ('gratitude', 4),
-        r'\b놀라|깜짝': ('surprise', 1),
-        r'\b기대|희망': ('hopeful', 2)
-    }
 
-    score = 0
-    used_keywords = Counter()
-    emotions = Counter()
-    total_emotion_score = 0
-
-    # 키워드 분석
-    for word, value in keywords.items():
-        print(word, value, end=" ")
-        count = message.count(word)
-        print(count)
-        score += count * value
-        if count > 0:
-            used_keywords[word] = count
-
-    # 감정 표현 분석
-    for pattern, (emotion, value) in emotion_patterns.items():
-        matches = re.findall(pattern, message)
-        if matches:
-            emotions[emotion] += len(matches)
-            total_emotion_score += value * len(matches)
-
-    # 주요 주제 식별
-    main_topics = [word for word, count in used_keywords.most_common(3)]
-
-    # 문장 복잡성 (간단한 측정)
-    sentence_count = len(re.findall(r'\w+[.!?]', message))
-    complexity = len(message.split()) / max(sentence_count, 1)
+def _stale_game_state_response(game_session_id):
+    logger.warning(f"동시에 처리된 턴과 충돌했습니다. 게임 세션: {game_session_id}")
+    return JsonResponse({'error': "다른 요청이 먼저 게임 상태를 변경했습니다. 다시 시도해주세요."}, status=409)
 
-    return {
-        'score': score,
-        'used_keywords': dict(used_keywords),
-        'emotions': dict(emotions),
-        'emotion_score': total_emotion_score,
-        'main_topics': main_topics,
-        'length': len(message),
-        'complexity': complexity,
-        'dominant_emotion': emotions.most_common(1)[0][0] if emotions else None
-    }
+
+def _closed_game_session_response(game_session_id):
+    logger.warning(f"이미 종료된 게임 세션에 대한 턴입니다. 게임 세션: {game_session_id}")
+    return JsonResponse({'error': "이미 종료된 게임입니다."}, status=409)
 
 
 @require_POST
 @csrf_protect
-@transaction.atomic
 def process_dialogue(request, game_session_id):
+    # 1) 읽기: 트랜잭션 없이 세션과 상태를 한 번에 조회
+    user_id = session_user_id(request.session)
+    if user_id is None:
+        return redirect_to_login(request.get_full_path())
     try:
+        # 다른 사용자의 세션은 없는 세션과 같이 404 (api_get_game_state와 같은 규칙)
         game_session = GameSession.objects.select_related('player', 'gamestate', 'storyprogress').get(
-            id=game_session_id)
+            id=game_session_id, player__user_id=user_id)
     except GameSession.DoesNotExist:
         logger.warning(f"게임 세션을 찾을 수 없습니다: {game_session_id}")
         return JsonResponse({"error": "게임 세션을 찾을 수 없습니다"}, status=404)
@@ -255,86 +224,338 @@ def process_dialogue(request, game_session_id):
         return HttpResponseBadRequest("메시지 내용이 비어있습니다.")
 
     try:
+        # 2) 분석 및 LLM 호출: 트랜잭션도 DB 연결도 잡지 않음
+        _release_db_connection()
         dialogue_analysis = analyze_dialogue_content(player_message)
-        Dialogue.objects.create(
-            game_session=game_session,
-            speaker='영웅',
-            content=player_message
-        )
-        demon_lord_response, demon_lord_analysis = generate_demon_lord_response(
+        demon_lord_response, demon_lord_analysis, player_analysis = generate_demon_lord_turn(
             player_message,
             game_session.gamestate,
             game_session.storyprogress.current_chapter
         )
-        Dialogue.objects.create(
-            game_session=game_session,
-            speaker='마왕',
-            content=demon_lord_response
-        )
-        updated_game_state = update_game_state(
+
+        # 3) 쓰기: 짧은 트랜잭션에서 GameState 버전을 확인하며 저장
+        updated_game_state, is_game_ended, end_result = _commit_turn(
             game_session,
             player_message,
             demon_lord_response,
-            dialogue_analysis
+            dialogue_analysis,
+            player_analysis
+        )
+
+        response_data = _build_turn_response(
+            demon_lord_response,
+            updated_game_state,
+            dialogue_analysis,
+            demon_lord_analysis,
+            is_game_ended,
+            end_result
         )
 
-        response_data = {
-            'demon_lord_response': demon_lord_response,
-            'game_state': {
-                'player_persuasion_level': updated_game_state['player_persuasion_level'],
-                'demon_lord_resistance': updated_game_state['demon_lord_resistance'],
-                'player_emotional_state': updated_game_state['player_emotional_state'],
-                'demon_lord_emotional_state': updated_game_state['demon_lord_emotional_state'],
-                'argument_strength': updated_game_state['argument_strength'],
+        logger.info(f"대화가 처리되었습니다. 게임 세션: {game_session_id}")
+        return JsonResponse(response_data)
+
+    except StaleGameStateError:
+        return _stale_game_state_response(game_session_id)
+
+    except GameSessionClosedError:
+        return _closed_game_session_response(game_session_id)
+
+    except Exception as e:
+        logger.exception(f"대화 처리 중 오류 발생. 게임 세션 {game_session_id}: {str(e)}")
+        return JsonResponse({'error': "대화 처리 중 예기치 못한 오류가 발생했습니다."}, status=500)
+
+
+def _build_turn_response(demon_lord_response, updated_game_state, dialogue_analysis, demon_lord_analysis,
+                         is_game_ended, end_result):
+    response_data = {
+        'demon_lord_response': demon_lord_response,
+        'game_state': {
+            'player_persuasion_level': updated_game_state['player_persuasion_level'],
+            'demon_lord_resistance': updated_game_state['demon_lord_resistance'],
+            'player_emotional_state': updated_game_state['player_emotional_state'],
+            'demon_lord_emotional_state': updated_game_state['demon_lord_emotional_state'],
+            'argument_strength': updated_game_state['argument_strength'],
+            'current_chapter': updated_game_state['current_chapter'],
+        },
+        'dialogue_analysis': dialogue_analysis,
+        'demon_lord_analysis': demon_lord_analysis,
+    }
+
+    if is_game_ended:
+        response_data['game_end'] = {
+            'result': end_result['result'],
+            'message': end_result['description']
+        }
+    return response_data
+
+
+def _commit_turn(game_session, player_message, demon_lord_response, dialogue_analysis, player_analysis=None):
+    # game 모델의 쓰기 DB(샤드를 쓰면 플레이어의 샤드) 트랜잭션에서 처리
+    using = game_db()
+    with transaction.atomic(using=using):
+        return _commit_turn_in_transaction(
+            using, game_session, player_message, demon_lord_response, dialogue_analysis, player_analysis)
+
+
+def _commit_turn_in_transaction(using, game_session, player_message, demon_lord_response, dialogue_analysis,
+                                player_analysis=None):
+    # LLM 호출이 끝난 뒤 대화 기록과 게임 상태를 한 번에 저장
+    # 그 사이 다른 턴이 먼저 저장됐다면 update_game_state가 StaleGameStateError를 내고 전체가 롤백됨
+    # 세션 행을 잠가 만료 처리(expire_sessions)와 겹치지 않게 하고, 이미 종료됐으면 GameSessionClosedError
+    is_active = GameSession.objects.select_for_update().filter(pk=game_session.pk).values_list(
+        'is_active', flat=True).first()
+    if not is_active:
+        raise GameSessionClosedError(f"GameSession {game_session.pk} is no longer active")
+    previous_state = build_snapshot(game_session)['data']
+    turn = TurnUnitOfWork(game_session)
+    turn.add_dialogue('영웅', player_message)
+    turn.add_dialogue('마왕', demon_lord_response)
+    updated_game_state = turn.flush(player_message, demon_lord_response, dialogue_analysis, player_analysis)
+    is_game_ended, end_result = check_game_end(game_session)
+
+    def after_commit():
+        # 커밋된 뒤에만 게임 상태 스냅샷을 갱신하고 (api_get_game_state 폴링용)
+        # WebSocket/long-poll 구독자에게 턴 결과, 상태 변화, 게임 종료를 알림
+        snapshot = store_snapshot(game_session)
+        publish_turn_events(
+            game_session.id,
+            {
+                'player_message': player_message,
+                'demon_lord_response': demon_lord_response,
                 'current_chapter': updated_game_state['current_chapter'],
             },
-            'dialogue_analysis': dialogue_analysis,
-            'demon_lord_analysis': demon_lord_analysis,
-        }
+            previous_state,
+            snapshot['data'],
+            end_result if is_game_ended else None
+        )
 
-        is_game_ended, end_result = check_game_end(game_session)
-        if is_game_ended:
-            response_data['game_end'] = {
-                'result': end_result['result'],
-                'message': end_result['description']
-            }
+    transaction.on_commit(after_commit, using=using)
+    return updated_game_state, is_game_ended, end_result
+
+
+@require_POST
+@csrf_protect
+async def aprocess_dialogue(request, game_session_id):
+    # process_dialogue의 비동기 버전: LLM 응답을 기다리는 동안 워커 스레드를 점유하지 않음
+    user_id = await asession_user_id(request.session)
+    if user_id is None:
+        return redirect_to_login(request.get_full_path())
+    try:
+        game_session = await GameSession.objects.select_related('player', 'gamestate', 'storyprogress').aget(
+            id=game_session_id, player__user_id=user_id)
+    except GameSession.DoesNotExist:
+        logger.warning(f"게임 세션을 찾을 수 없습니다: {game_session_id}")
+        return JsonResponse({"error": "게임 세션을 찾을 수 없습니다"}, status=404)
+
+    player_message = request.POST.get('message')
+
+    if not player_message:
+        return HttpResponseBadRequest("메시지 내용이 비어있습니다.")
+
+    try:
+        dialogue_analysis = analyze_dialogue_content(player_message)
+        demon_lord_response, demon_lord_analysis, player_analysis = await agenerate_demon_lord_turn(
+            player_message,
+            game_session.gamestate,
+            game_session.storyprogress.current_chapter
+        )
+        updated_game_state, is_game_ended, end_result = await sync_to_async(_commit_turn)(
+            game_session,
+            player_message,
+            demon_lord_response,
+            dialogue_analysis,
+            player_analysis
+        )
+
+        response_data = _build_turn_response(
+            demon_lord_response,
+            updated_game_state,
+            dialogue_analysis,
+            demon_lord_analysis,
+            is_game_ended,
+            end_result
+        )
 
         logger.info(f"대화가 처리되었습니다. 게임 세션: {game_session_id}")
         return JsonResponse(response_data)
 
+    except StaleGameStateError:
+        return _stale_game_state_response(game_session_id)
+
+    except GameSessionClosedError:
+        return _closed_game_session_response(game_session_id)
+
     except Exception as e:
         logger.exception(f"대화 처리 중 오류 발생. 게임 세션 {game_session_id}: {str(e)}")
         return JsonResponse({'error': "대화 처리 중 예기치 못한 오류가 발생했습니다."}, status=500)
 
 
-@login_required
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@require_POST
+@csrf_protect
+async def process_dialogue_stream(request, game_session_id):
+    # 마왕의 응답을 server-sent events로 토큰 단위 전송하고, 스트림이 끝나면 턴을 저장
+    user_id = await asession_user_id(request.session)
+    if user_id is None:
+        return redirect_to_login(request.get_full_path())
+    try:
+        game_session = await GameSession.objects.select_related('player', 'gamestate', 'storyprogress').aget(
+            id=game_session_id, player__user_id=user_id)
+    except GameSession.DoesNotExist:
+        logger.warning(f"게임 세션을 찾을 수 없습니다: {game_session_id}")
+        return JsonResponse({"error": "게임 세션을 찾을 수 없습니다"}, status=404)
+
+    player_message = request.POST.get('message')
+
+    if not player_message:
+        return HttpResponseBadRequest("메시지 내용이 비어있습니다.")
+
+    dialogue_analysis = analyze_dialogue_content(player_message)
+
+    async def event_stream():
+        chunks = []
+        async for delta in astream_demon_lord_response(
+                player_message,
+                game_session.gamestate,
+                game_session.storyprogress.current_chapter
+        ):
+            chunks.append(delta)
+            yield _sse_event('token', {'delta': delta})
+
+        try:
+            demon_lord_response, demon_lord_analysis = finalize_demon_lord_response(
+                player_message,
+                ''.join(chunks).strip(),
+                game_session.gamestate
+            )
+            updated_game_state, is_game_ended, end_result = await sync_to_async(_commit_turn)(
+                game_session,
+                player_message,
+                demon_lord_response,
+                dialogue_analysis
+            )
+        except StaleGameStateError:
+            logger.warning(f"동시에 처리된 턴과 충돌했습니다. 게임 세션: {game_session_id}")
+            yield _sse_event('error', {'error': "다른 요청이 먼저 게임 상태를 변경했습니다. 다시 시도해주세요."})
+            return
+        except GameSessionClosedError:
+            logger.warning(f"이미 종료된 게임 세션에 대한 턴입니다. 게임 세션: {game_session_id}")
+            yield _sse_event('error', {'error': "이미 종료된 게임입니다."})
+            return
+        except Exception as e:
+            logger.exception(f"대화 처리 중 오류 발생. 게임 세션 {game_session_id}: {str(e)}")
+            yield _sse_event('error', {'error': "대화 처리 중 예기치 못한 오류가 발생했습니다."})
+            return
+
+        logger.info(f"대화가 처리되었습니다. 게임 세션: {game_session_id}")
+        yield _sse_event('done', _build_turn_response(
+            demon_lord_response,
+            updated_game_state,
+            dialogue_analysis,
+            demon_lord_analysis,
+            is_game_ended,
+            end_result
+        ))
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # 프록시(nginx)의 버퍼링 비활성화
+    return response
+
+
 @require_GET
 def api_get_game_state(request, game_session_id):
+    # 프런트엔드가 주기적으로 호출하는 엔드포인트: 턴 커밋 시 갱신되는 캐시 스냅샷으로 응답하고,
+    # If-None-Match가 현재 ETag와 같으면 DB 조회 없이 304
+    user_id = session_user_id(request.session)
+    if user_id is None:
+        return redirect_to_login(request.get_full_path())
+
     try:
-        game_session = GameSession.objects.select_related('gamestate', 'storyprogress').get(
-            id=game_session_id,
-            player__user=request.user
-        )
-        game_state = game_session.gamestate
-        story_progress = game_session.storyprogress
+        snapshot = get_snapshot(game_session_id)
+        if snapshot is None or snapshot['owner_id'] != str(user_id):
+            return JsonResponse({'error': '게임 세션을 찾을 수 없습니다.'}, status=404)
 
-        return JsonResponse({
-            'player_persuasion_level': game_state.player_persuasion_level,
-            'demon_lord_resistance': game_state.demon_lord_resistance,
-            'player_emotional_state': game_state.player_emotional_state,
-            'demon_lord_emotional_state': game_state.demon_lord_emotional_state,
-            'argument_strength': game_state.argument_strength,
-            'current_chapter': story_progress.current_chapter,
-            'is_completed': game_session.is_completed,
-            'result': game_session.result if game_session.is_completed else None
-        })
-    except GameSession.DoesNotExist:
-        return JsonResponse({'error': '게임 세션을 찾을 수 없습니다.'}, status=404)
+        if snapshot['etag'] in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            response = JsonResponse(snapshot['data'])
+        response['ETag'] = snapshot['etag']
+        response['Cache-Control'] = 'private, no-cache'
+        return response
     except Exception as e:
         logger.error(f"게임 상태 조회 중 오류 발생: {str(e)}")
         return JsonResponse({'error': '게임 상태 조회 중 오류가 발생했습니다.'}, status=500)
 
 
+@require_GET
+async def api_game_events(request, game_session_id):
+    # WebSocket을 쓸 수 없는 클라이언트용 long-poll: ?after=<마지막으로 받은 seq>
+    # 새 이벤트가 있으면 바로, 없으면 LONG_POLL_TIMEOUT까지 기다렸다가 응답 (빈 목록이면 같은 after로 다시 요청)
+    user_id = await asession_user_id(request.session)
+    if user_id is None:
+        return redirect_to_login(request.get_full_path())
+    snapshot = await sync_to_async(get_snapshot)(game_session_id)
+    if snapshot is None or snapshot['owner_id'] != str(user_id):
+        return JsonResponse({'error': '게임 세션을 찾을 수 없습니다.'}, status=404)
+
+    try:
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        return HttpResponseBadRequest("after 값이 올바르지 않습니다.")
+
+    # 구독을 먼저 걸고 기록을 확인해, 그 사이 발행된 이벤트를 놓치지 않음
+    subscription = subscribe_game_events(game_session_id)
+    try:
+        events = recent_game_events(game_session_id, after)
+        if not events:
+            try:
+                event = await subscription.get(timeout=get_event_settings()['LONG_POLL_TIMEOUT'])
+            except asyncio.TimeoutError:
+                event = None
+            events = recent_game_events(game_session_id, after) or ([event] if event else [])
+    finally:
+        subscription.close()
+
+    return JsonResponse({
+        'events': events,
+        'last_seq': events[-1]['seq'] if events else after,
+    })
+
+
+@login_required
+@require_GET
+def api_transcript(request, game_session_id):
+    # 대화 기록을 cursor 기반으로 나눠 반환 (?cursor=<next_cursor>&limit=<개수>)
+    # 보관(archive_transcripts)된 세션은 GameResult의 압축 기록에서 읽음
+    archives = list(GameSession.objects.filter(id=game_session_id, player__user=request.user).values_list(
+        'game_result__archived_at', flat=True))
+    if not archives:
+        return JsonResponse({'error': '게임 세션을 찾을 수 없습니다.'}, status=404)
+
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+        dialogues, next_cursor = transcript_page(game_session_id, request.GET.get('cursor'), limit, archives[0])
+    except (ValueError, InvalidCursor):
+        return JsonResponse({'error': '잘못된 페이지 요청입니다.'}, status=400)
+
+    return JsonResponse({
+        'dialogues': [
+            {
+                'id': dialogue.id,
+                'speaker': dialogue.speaker,
+                'content': dialogue.content,
+                'timestamp': dialogue.timestamp.isoformat(),
+            }
+            for dialogue in dialogues
+        ],
+        'next_cursor': next_cursor,
+    })
+
+
 def update_persuasion_and_resistance(game_state, player_analysis, dialogue_analysis, calculate_resistance_decrease):
     # 대화 분석 결과를 바탕으로 가중치 계산
     dialogue_score = dialogue_analysis['score']
@@ -476,29 +697,29 @@ def update_argument_strength(game_state, player_analysis, dialogue_analysis):
 
 
 def end_game(game_session: GameSession, result: str) -> None:
+    game_session.is_active = False
+    game_session.is_completed = True
+    end_time = timezone.now()
+    game_session.end_time = end_time
+    game_session.result = result
+    game_session.save()
+
+    # 최종 게임 상태 저장. 이미 결과가 있으면 savepoint만 되돌리고 (바깥 턴 트랜잭션은 유지) 기존 결과를 둠
     try:
-        game_session.is_active = False
-        game_session.is_completed = True
-        end_time = timezone.now()
-        game_session.end_time = end_time
-        game_session.result = result
-        game_session.save()
-
-        # 최종 게임 상태 저장
-        GameResult.objects.create(
-            game_session=game_session,
-            result=result,
-            final_persuasion_level=game_session.gamestate.player_persuasion_level,
-            final_demon_resistance=game_session.gamestate.demon_lord_resistance,
-            final_chapter=game_session.storyprogress.current_chapter,
-            total_turns=game_session.dialogues.count(),
-            duration=end_time - game_session.start_time
-        )
-
-        logger.info(f"게임 종료 처리 완료. 세션 ID: {game_session.id}, 결과: {result}")
-
-    except Exception as e:
-        logger.error(f"게임 종료 처리 중 오류 발생. 세션 ID: {game_session.id}, 오류: {str(e)}")
+        with transaction.atomic(using=game_db()):
+            GameResult.objects.create(
+                game_session=game_session,
+                result=result,
+                final_persuasion_level=game_session.gamestate.player_persuasion_level,
+                final_demon_resistance=game_session.gamestate.demon_lord_resistance,
+                final_chapter=game_session.storyprogress.current_chapter,
+                total_turns=game_session.storyprogress.turn_count,
+                duration=end_time - game_session.start_time
+            )
+    except IntegrityError:
+        logger.warning(f"게임 결과가 이미 기록되어 있습니다. 세션 ID: {game_session.id}")
+
+    logger.info(f"게임 종료 처리 완료. 세션 ID: {game_session.id}, 결과: {result}")
 
 
 def check_game_end(game_session) -> Tuple[bool, Dict]:
@@ -513,11 +734,12 @@ def check_game_end(game_session) -> Tuple[bool, Dict]:
              '마왕의 저항이 완전히 무너졌습니다!'),
             ('완벽한 엔딩', lambda: story_progress.current_chapter >= 5 and game_state.player_persuasion_level >= 90,
              '플레이어가 마왕과의 대화에서 탁월한 성과를 거두었습니다!'),
-            ('시간 초과', lambda: (timezone.now() - game_session.start_time).total_seconds() > 3600,
+            (TIMEOUT_RESULT, lambda: is_session_expired(game_session),
              '제한 시간 내에 마왕을 설득하지 못했습니다.'),
-            ('대화 턴 초과', lambda: game_session.dialogues.count() > 50,
+            # 턴마다 대화 2줄이 쌓이므로 기존의 '대화 50개 초과'와 같은 조건 (Dialogue 테이블을 세지 않음)
+            ('대화 턴 초과', lambda: story_progress.turn_count > MAX_DIALOGUE_TURNS,
              '너무 많은 대화를 나누어 마왕이 지쳤습니다.'),
-            ('스토리 기반 엔딩', lambda: 'game_over_event' in story_progress.plot_points,
+            ('스토리 기반 엔딩', lambda: story_progress.game_over,
              '스토리의 특정 이벤트로 인해 게임이 종료되었습니다.')
         ]
 
@@ -542,18 +764,61 @@ def check_game_end(game_session) -> Tuple[bool, Dict]:
         return True, {'result': '오류', 'description': error_msg}
 
 
-@login_required
 def game_result(request, game_session_id):
-    game_session = get_object_or_404(GameSession, id=game_session_id)
+    # 완료된 세션의 결과 페이지는 바뀌지 않으므로 세션+페이지별로 응답 전체를 캐시
+    # (권한 확인은 캐시를 읽기 전에, 세션의 사용자 id와 인증 해시로 수행)
+    user_id = session_user_id(request.session)
+    if user_id is None:
+        return redirect_to_login(request.get_full_path())
+
+    meta = get_result_meta(game_session_id)
+    if meta is None:
+        raise Http404("게임 세션을 찾을 수 없습니다.")
 
     # 권한 확인
-    if game_session.player.user != request.user:
+    if meta['owner_id'] != str(user_id):
         return HttpResponseForbidden("이 게임 결과를 볼 수 있는 권한이 없습니다.")
 
     # 게임 완료 확인
-    if not game_session.is_completed:
+    if not meta['is_completed']:
         return HttpResponseForbidden("이 게임은 아직 완료되지 않았습니다.")
 
+    # 표시할 메시지가 있거나 CSRF 쿠키가 아직 없으면 (페이지 내용이 요청마다 달라짐) 캐시하지 않음
+    cursor = request.GET.get('cursor', '')
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    if not csrf_cookie or len(get_messages(request)):
+        return _render_game_result(request, game_session_id, cursor)
+
+    page = get_cached_page(meta, cursor, csrf_cookie)
+    if page is None:
+        response = _render_game_result(request, game_session_id, cursor)
+        if response.status_code != 200:
+            return response
+        page = store_page(meta, cursor, csrf_cookie, response.content)
+
+    last_modified = page['last_modified']
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    if request.headers.get('If-None-Match'):
+        not_modified = page['etag'] in request.headers['If-None-Match']
+    else:
+        not_modified = bool(last_modified and if_modified_since
+                            and int(last_modified.timestamp()) <= if_modified_since)
+
+    response = HttpResponseNotModified() if not_modified else HttpResponse(page['content'])
+    response['ETag'] = page['etag']
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # 브라우저는 매번 재검증 (보관/삭제로 내용이 바뀌면 바로 반영되고, 그대로면 ETag/Last-Modified로 304)
+    response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    return response
+
+
+def _render_game_result(request, game_session_id, cursor):
+    game_session = get_object_or_404(
+        GameSession.objects.select_related('gamestate', 'storyprogress', 'game_result').defer(
+            'game_result__transcript_archive'),
+        id=game_session_id)
+
     # GameResult 가져오기
     try:
         game_result = game_session.game_result
@@ -561,19 +826,19 @@ def game_result(request, game_session_id):
         # GameResult가 없는 경우 처리 (예: 이전 버전에서 생성된 게임 세션)
         game_result = None
 
-    # 대화 내용 가져오기
-    dialogues = game_session.dialogues.order_by('timestamp')
-
-    # 대화 내용 페이지네이션
-    dialogues = game_session.dialogues.order_by('timestamp')
-    paginator = Paginator(dialogues, 20)  # 페이지당 20개의 대화 표시
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # 대화 내용 페이지네이션 (transcript API와 같은 keyset 방식, 페이지당 20개, COUNT 없음)
+    # 보관된 세션은 GameResult의 압축 기록에서 읽음
+    archived_at = game_result.archived_at if game_result else None
+    try:
+        dialogues, next_cursor = transcript_page(game_session.id, cursor, archived_at=archived_at)
+    except InvalidCursor:
+        dialogues, next_cursor = transcript_page(game_session.id, archived_at=archived_at)
 
     context = {
         'game_session': game_session,
         'game_result': game_result,
         'dialogues': dialogues,
+        'next_cursor': next_cursor,
         'final_state': game_session.gamestate,
         'story_progress': game_session.storyprogress,
         'total_turns': game_result.total_turns,
@@ -582,6 +847,15 @@ def game_result(request, game_session_id):
     return render(request, 'game/result.html', context)
 
 
+@login_required
+@require_GET
+def api_db_pool_metrics(request):
+    # DB별 연결 풀 상태 (사용 중/대기 연결 수, 평균 대기 시간, 초당 연결 요청 수). 운영자만 조회 가능
+    if not request.user.is_staff:
+        return HttpResponseForbidden("권한이 없습니다.")
+    return JsonResponse({'databases': all_pool_metrics()})
+
+
 @ensure_csrf_cookie
 def get_csrf_token(request):
     return JsonResponse({'success': 'CSRF cookie set'})